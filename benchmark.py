@@ -0,0 +1,235 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import delauney as dlny
+import geometrycache
+import NewVelocityPlanner as nvp
+import VelocityPlanner as vp
+from trackgeometry import get_circles, get_arc_lengths
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000, 1000000]
+STAGES = ["midpoints", "global_midpoints", "circles", "arc_lengths", "calculate_profile", "getVelocitiesNew"]
+MIDPOINT_STAGES = ("midpoints", "global_midpoints")
+
+def generate_track(no_cones, seed=0, cone_spacing=5.0, track_width=3.0, noise=0.05):
+    """Generates a random closed circuit lined with yellow and blue cones
+
+    The centerline is a circle with a few random harmonic wiggles added to its radius.
+    The wiggles have wavelengths between 60 and 400 m and are kept gentle enough that
+    no corner is tighter than about 12 m, so the cone lines never cross, whatever the track size.
+
+    Parameters
+    ----------
+    no_cones: the total number of cones, half yellow and half blue
+
+    seed: seed for the random generator, the same seed always gives the same track
+
+    cone_spacing: distance between consecutive cones of the same colour along the centerline
+
+    track_width: distance between a yellow cone and the blue cone next to it
+
+    noise: standard deviation of the random error added to every cone position
+
+    Returns
+    -------
+    A tuple (yellow_cones, blue_cones), each an array of (x,y) coordinates with no_cones // 2 rows.
+    Yellow cone i and blue cone i face each other across the track.
+    """
+    rng = np.random.default_rng(seed)
+    no_pairs = no_cones // 2
+    radius = no_pairs * cone_spacing / (2 * np.pi)
+
+    # radius(theta) = radius + sum of a_k cos(k theta + phase_k), each wiggle adds at most 0.01 to the curvature
+    harmonics = np.arange(max(2, int(np.ceil(2 * np.pi * radius / 400))), int(2 * np.pi * radius / 60) + 1)
+    harmonics = rng.choice(harmonics, size=min(8, harmonics.size), replace=False) if harmonics.size else harmonics
+    amplitudes = 0.01 * radius * radius / (harmonics * harmonics)
+    phases = rng.uniform(0, 2 * np.pi, harmonics.size)
+
+    # sample the centerline densely, then place the cone pairs at equal distances along it
+    theta = np.linspace(0, 2 * np.pi, 4 * no_pairs + 1)
+    r = radius + np.cos(np.outer(theta, harmonics) + phases) @ amplitudes
+    centerline = np.column_stack((r * np.cos(theta), r * np.sin(theta)))
+    step = np.diff(centerline, axis=0)
+    station = np.insert(np.cumsum(np.hypot(step[:, 0], step[:, 1])), 0, 0.0)
+    targets = np.linspace(0, station[-1], no_pairs, endpoint=False)
+    centerline = np.column_stack((np.interp(targets, station, centerline[:, 0]), np.interp(targets, station, centerline[:, 1])))
+
+    # the cones sit half a track width either side of the centerline, along its normal
+    tangent = np.roll(centerline, -1, axis=0) - np.roll(centerline, 1, axis=0)
+    tangent /= np.hypot(tangent[:, 0], tangent[:, 1])[:, None]
+    normal = np.column_stack((-tangent[:, 1], tangent[:, 0]))
+    yellow_cones = centerline - 0.5 * track_width * normal + rng.normal(0, noise, (no_pairs, 2))
+    blue_cones = centerline + 0.5 * track_width * normal + rng.normal(0, noise, (no_pairs, 2))
+    return yellow_cones, blue_cones
+
+def _run_stage(stage, data):
+    # runs one stage on the outputs of the earlier stages, returns (input points, output)
+    if stage == "midpoints":
+        return len(data["cones"]), np.array(nvp.get_midpoints(data["cones"], 3))
+    if stage == "global_midpoints":
+        return len(data["cones"]), nvp.get_midpoints(data["cones"], None, closed=True)
+    if stage == "circles":
+        return len(data["midpoints"]), get_circles(data["midpoints"], closed=True)
+    if stage == "arc_lengths":
+        return len(data["midpoints"]), get_arc_lengths(data["midpoints"], data["circles"], closed=True)
+    if stage == "calculate_profile":
+        return len(data["midpoints"]), nvp.VelocityPlanner(18).calculate_profile(data["midpoints"], 0, closed=True)
+    if stage == "getVelocitiesNew":
+        return len(data["midpoints"]), vp.getVelocitiesNew(data["midpoints"], data["circles"], 2, 2, 8, closed=True)
+    raise ValueError(f"unknown stage {stage!r}")
+
+def _time_stage(stage, data, repeat):
+    # best of repeat runs for the time, then one more run under tracemalloc for the peak memory
+    # the geometry cache is off while timing, the repeated runs would otherwise only measure cache hits
+    cache = geometrycache.cache
+    geometrycache.disable()
+    try:
+        seconds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            points, output = _run_stage(stage, data)
+            seconds.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        _run_stage(stage, data)
+        _, peak_memory = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        geometrycache.cache = cache
+    return points, min(seconds), peak_memory, output
+
+def run_benchmark(sizes=DEFAULT_SIZES, stages=STAGES, repeat=3, max_seconds=30.0, seed=0):
+    """Times every stage of the cone to velocity pipeline on synthetic tracks of growing size
+
+    Parameters
+    ----------
+    sizes: the number of cones of every track
+
+    stages: the stages to time, any of STAGES. Stages that are left out but needed by a later
+    stage still run, they are just not timed.
+
+    repeat: how many times each stage is timed, the fastest run counts
+
+    max_seconds: once a stage takes longer than this it is skipped for the bigger tracks.
+    The later stages use the midpoints of the last midpoint stage that ran (global_midpoints,
+    then midpoints), or the midpoints between the facing cone pairs if neither did.
+    Which one is recorded in the source field of their results.
+
+    seed: seed for generate_track
+
+    Returns
+    -------
+    A list of dicts, one per track size and stage, with the keys cones, stage, source, points,
+    seconds, points_per_second and peak_memory_bytes
+    """
+    results = []
+    too_slow = set()
+    for no_cones in sizes:
+        yellow_cones, blue_cones = generate_track(no_cones, seed)
+        data = {"cones": dlny.combine_yellow_and_blue_cones(yellow_cones, blue_cones)}
+        data["midpoints"] = 0.5 * (yellow_cones + blue_cones)
+        source = "pairs"
+        for stage in STAGES:
+            timed = stage in stages and stage not in too_slow
+            if not timed:
+                if stage in ("circles", "arc_lengths"):
+                    data[stage] = _run_stage(stage, data)[1]
+                continue
+
+            points, seconds, peak_memory, output = _time_stage(stage, data, repeat)
+            if stage in MIDPOINT_STAGES:
+                # the global triangulation is used over the windowed one when both are timed
+                data["midpoints"], source = output, stage
+            else:
+                data[stage] = output
+            results.append({
+                "cones": no_cones,
+                "stage": stage,
+                "source": "cones" if stage in MIDPOINT_STAGES else source,
+                "points": points,
+                "seconds": seconds,
+                "points_per_second": points / seconds if seconds > 0 else float("inf"),
+                "peak_memory_bytes": peak_memory,
+            })
+            print(f"{no_cones:>9} cones  {stage:<18} {points:>9} points  {seconds:10.4f} s  "
+                  f"{results[-1]['points_per_second']:14.0f} points/s  {peak_memory / 2**20:9.2f} MiB")
+            if seconds > max_seconds:
+                too_slow.add(stage)
+    return results
+
+def compare_results(results, baseline, tolerance=0.2, min_seconds=1e-3):
+    """Finds the stages that got slower or use more memory than in a baseline run
+
+    Parameters
+    ----------
+    results: the results of run_benchmark
+
+    baseline: the results of an earlier run_benchmark to compare against
+
+    tolerance: the allowed relative increase, 0.2 flags anything more than 20% slower or bigger
+
+    min_seconds: slowdowns smaller than this are timer noise and never flagged
+
+    Returns
+    -------
+    A list of (cones, stage, metric, baseline value, new value) tuples, one per regression.
+    Stages that are only in one of the two runs are not compared.
+    """
+    previous = {(result["cones"], result["stage"], result["source"]): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get((result["cones"], result["stage"], result["source"]))
+        if old is None:
+            continue
+        for metric in ("seconds", "peak_memory_bytes"):
+            if metric == "seconds" and result[metric] - old[metric] < min_seconds:
+                continue
+            if result[metric] > old[metric] * (1 + tolerance):
+                regressions.append((result["cones"], result["stage"], metric, old[metric], result[metric]))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cone to velocity pipeline on synthetic tracks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="number of cones of each track")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="stages to time")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, the fastest counts")
+    parser.add_argument("--max-seconds", type=float, default=30.0, help="skip a stage on bigger tracks once it takes longer than this")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the track generator")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON file of a baseline run to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown or memory growth")
+    args = parser.parse_args()
+
+    results = run_benchmark(args.sizes, args.stages, args.repeat, args.max_seconds, args.seed)
+
+    if args.output:
+        report = {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.platform(),
+            "seed": args.seed,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_results(results, baseline, args.tolerance)
+        for no_cones, stage, metric, old, new in regressions:
+            print(f"REGRESSION {no_cones} cones {stage}: {metric} {old:.4g} -> {new:.4g} ({new / old - 1:+.0%})")
+        if regressions:
+            sys.exit(1)
+        print("no regressions against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
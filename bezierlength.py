@@ -1,18 +1,62 @@
 import numpy as np
-import time
 import math
-import random
-begin = time.time()
+from collections import namedtuple
 #Legendre-Gauss arc length approximation for a cubic bezier
 #for motion profiling initial distnace
-P0, P1, P2, P3 = np.array([-12, -36]), np.array([-12, -52]), np.array([-26, -36]), np.array([-36, -60])
-60
 def derivative_cubic_bezier(t, P0, P1, P2, P3):
     return 3*(1-t)**2 * (P1 - P0) + 6*(1-t)*t * (P2 - P1) + 3*t**2 * (P3 - P2)
 
 def cubic_bezier_curve(t, P0, P1, P2, P3):
     return (1-t)**3 * P0 + 3 * (1-t)**2 * t * P1 + 3 * (1-t) * t**2 * P2 + t**3 * P3
 
+# everything about a cubic bezier at an array of t, every array has the shape of t plus the trailing axis shown
+# points, first, second: (..., 2) position and first and second derivatives
+# normals: (..., 2) unit normals, the tangent turned a quarter turn to the left
+# curvature: (...) signed curvature, positive when the curve turns left
+BezierEvaluation = namedtuple("BezierEvaluation", ["points", "first", "second", "normals", "curvature"])
+
+def cubic_bezier_points(P, t):
+    # position at every t, P is the (4, 2) control points
+    P = np.asarray(P, dtype=float)
+    t = np.asarray(t, dtype=float)[..., None]
+    s = 1 - t
+    return (s * s * s) * P[0] + (3 * s * s * t) * P[1] + (3 * s * t * t) * P[2] + (t * t * t) * P[3]
+
+def cubic_bezier_derivatives(P, t):
+    # (first, second) derivative at every t
+    P = np.asarray(P, dtype=float)
+    t = np.asarray(t, dtype=float)[..., None]
+    s = 1 - t
+    first = (3 * s * s) * (P[1] - P[0]) + (6 * s * t) * (P[2] - P[1]) + (3 * t * t) * (P[3] - P[2])
+    second = (6 * s) * (P[2] - 2 * P[1] + P[0]) + (6 * t) * (P[3] - 2 * P[2] + P[1])
+    return first, second
+
+def evaluate_cubic_bezier(P, t):
+    """Evaluates a cubic bezier at many t at once
+
+    Parameters
+    ----------
+    P: the four control points, shape (4, 2)
+
+    t: array of curve parameters in [0, 1] of any shape
+
+    Returns
+    -------
+    A BezierEvaluation (points, first, second, normals, curvature). Where the curve stops
+    (a zero first derivative) the normal is NaN and the curvature uses a speed of 1e-2,
+    like cubicBezierMotionProfile.curvature always did.
+    """
+    points = cubic_bezier_points(P, t)
+    first, second = cubic_bezier_derivatives(P, t)
+    speed_sq = first[..., 0] * first[..., 0] + first[..., 1] * first[..., 1]
+    speed = np.sqrt(speed_sq)
+    normals = np.empty_like(first)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        normals[..., 0] = -first[..., 1] / speed
+        normals[..., 1] = first[..., 0] / speed
+    curvature = (first[..., 0] * second[..., 1] - first[..., 1] * second[..., 0]) / np.maximum(speed_sq ** 1.5, 1e-6)
+    return BezierEvaluation(points, first, second, normals, curvature)
+
 coefficent_24 = [
     (0.1279381953467522, -0.0640568928626056),
     (0.1279381953467522, 0.0640568928626056),
@@ -41,12 +85,54 @@ coefficent_24 = [
 ]
 
 
+# Gauss-Legendre nodes and weights per order, as (nodes, weights) arrays. 24 is the table above,
+# other orders are filled in from numpy the first time they are used
+_gauss_legendre = {24: (np.array([node for _, node in coefficent_24]), np.array([weight for weight, _ in coefficent_24]))}
+
+def get_gauss_legendre(order):
+    if order not in _gauss_legendre:
+        nodes, weights = np.polynomial.legendre.leggauss(order)
+        _gauss_legendre[order] = (nodes, weights)
+    return _gauss_legendre[order]
+
+def _gauss_legendre_pieces(control_points, segments, a, b, order):
+    # Gauss-Legendre integral of the speed over [a[i], b[i]] of segment segments[i], for every i
+    nodes, weights = get_gauss_legendre(order)
+    t = 0.5 * (nodes + 1) * (b - a)[:, None] + a[:, None]
+    s = 1 - t
+    P = control_points[segments]
+    d0 = (P[:, 1] - P[:, 0])[:, None, :]
+    d1 = (P[:, 2] - P[:, 1])[:, None, :]
+    d2 = (P[:, 3] - P[:, 2])[:, None, :]
+    derivative = (3 * s * s)[..., None] * d0 + (6 * s * t)[..., None] * d1 + (3 * t * t)[..., None] * d2
+    speed = np.sqrt(derivative[..., 0] * derivative[..., 0] + derivative[..., 1] * derivative[..., 1])
+    return (speed @ weights) * (b - a) / 2
+
+def bezier_arclengths(control_points, t1=0, t2=1, order=24):
+    """Arc lengths of many cubic bezier segments at once, with Gauss-Legendre quadrature
+
+    Parameters
+    ----------
+    control_points: array of shape (S, 4, 2), the control points P0, P1, P2, P3 of every segment
+
+    t1, t2: the parameter range to measure, either one value for every segment or arrays of shape (S,)
+
+    order: the number of quadrature nodes, 24 matches bezier_arclength
+
+    Returns
+    -------
+    Array of shape (S,) with the length of every segment between t1 and t2
+    """
+    control_points = np.asarray(control_points, dtype=float)
+    t1 = np.broadcast_to(np.asarray(t1, dtype=float), control_points.shape[:1])
+    t2 = np.broadcast_to(np.asarray(t2, dtype=float), control_points.shape[:1])
+    return _gauss_legendre_pieces(control_points, np.arange(len(control_points)), t1, t2, order)
+
 def integrand(t, P0, P1, P2, P3):
     derivative = derivative_cubic_bezier(t, P0, P1, P2, P3)
     return np.sqrt(np.sum(derivative**2))
 
 def bezier_arclength(P0, P1, P2, P3, t1=0, t2=1):
-    begin = time.time()
     n = len(coefficent_24)
     length = 0
     for i in range(n):
@@ -59,18 +145,83 @@ def distance(P0, P1):
     return math.sqrt((P0[0] - P1[0]) * (P0[0] - P1[0]) +  (P0[1] - P1[1]) * (P0[1] - P1[1]))
 
 def bezier_real_arc_len(P0, P1, P2, P3, t1 = 0, t2 = 1):
-    begin = time.time()
-    counter = t1
-    prevPoint = cubic_bezier_curve(counter, P0, P1, P2, P3)
-    total_distance = 0
-    while(counter < t2):
-        counter += 1/100
-        current_point = cubic_bezier_curve(counter, P0, P1, P2, P3)
-        total_distance += distance(prevPoint, current_point)
-        prevPoint = current_point
-    return total_distance
-        
-
-arc_length = bezier_arclength(P0, P1, P2, P3, 0.5, 0.7)
-real_arc_length = bezier_real_arc_len(P0, P1, P2, P3, 0.5, 0.7)
-print(arc_length, real_arc_length)
\ No newline at end of file
+    # length of the polyline through the curve in steps of 1/100 in t, the last step is cut short so it ends exactly at t2
+    steps = max(1, math.ceil(round((t2 - t1) * 100, 9)))
+    t = np.minimum(t1 + np.arange(steps + 1) / 100, t2)
+    points = cubic_bezier_points([P0, P1, P2, P3], t)
+    step = np.diff(points, axis=0)
+    return float(np.sum(np.sqrt(step[:, 0] * step[:, 0] + step[:, 1] * step[:, 1])))
+
+# lengths: the arc length of every segment
+# errors: a bound on the error of every length, the sum of the differences between the low and high order rules
+# evaluations: the number of derivative evaluations spent on every segment
+ArcLengths = namedtuple("ArcLengths", ["lengths", "errors", "evaluations"])
+
+# the smallest error estimate, relative to the length of an interval, worth halving it for.
+# Below this the two rules only differ by rounding and halving again does not make either more accurate
+RELATIVE_FLOOR = 1e-13
+
+def adaptive_bezier_arclengths(control_points, t1=0, t2=1, tolerance=1e-6, order=6, max_depth=30):
+    """Arc lengths of many cubic bezier segments, each to within a tolerance
+
+    Every interval is integrated with an order point and a 2 * order point Gauss-Legendre rule.
+    The difference between the two is the error estimate of the (more accurate) high order result.
+    Intervals whose estimate is more than their share of the tolerance are halved and tried again,
+    so a gentle segment is done after 3 * order evaluations and only the parts of a segment near
+    a cusp or a tight turn are subdivided. All the intervals of all the segments at one depth are
+    evaluated together.
+
+    Parameters
+    ----------
+    control_points: array of shape (S, 4, 2), the control points P0, P1, P2, P3 of every segment
+
+    t1, t2: the parameter range to measure, either one value for every segment or arrays of shape (S,).
+    Like bezier_arclengths the length is negative where t2 < t1
+
+    tolerance: the largest error wanted on every length. An interval is also accepted once its error
+    estimate is down to the rounding of its length (RELATIVE_FLOOR of it), so tolerance=0 means
+    as accurate as floating point allows
+
+    order: the order of the low order rule
+
+    max_depth: the most times an interval is halved, the intervals still too inaccurate at this
+    depth are accepted and their estimate is still added to the error bound
+
+    Returns
+    -------
+    An ArcLengths (lengths, errors, evaluations), every one an array of shape (S,)
+    """
+    control_points = np.asarray(control_points, dtype=float)
+    no_segments = len(control_points)
+    t1 = np.broadcast_to(np.asarray(t1, dtype=float), (no_segments,))
+    t2 = np.broadcast_to(np.asarray(t2, dtype=float), (no_segments,))
+    lengths = np.zeros(no_segments)
+    errors = np.zeros(no_segments)
+    evaluations = np.zeros(no_segments, dtype=np.int64)
+
+    # the intervals still to integrate, as (segment, start, end) arrays
+    segments, a, b = np.arange(no_segments), t1.copy(), t2.copy()
+    span = np.where(t2 != t1, np.abs(t2 - t1), 1.0)
+    for depth in range(max_depth + 1):
+        if segments.size == 0:
+            break
+        low = _gauss_legendre_pieces(control_points, segments, a, b, order)
+        high = _gauss_legendre_pieces(control_points, segments, a, b, 2 * order)
+        estimate = np.abs(high - low)
+        evaluations += np.bincount(segments, minlength=no_segments) * 3 * order
+        # every interval may use the part of the tolerance that its share of [t1, t2] is
+        allowed = np.maximum(tolerance * np.abs(b - a) / span[segments], RELATIVE_FLOOR * np.abs(high))
+        done = (estimate <= allowed) | (depth == max_depth)
+        lengths += np.bincount(segments[done], high[done], minlength=no_segments)
+        errors += np.bincount(segments[done], estimate[done], minlength=no_segments)
+
+        segments, a, b = segments[~done], a[~done], b[~done]
+        middle = 0.5 * (a + b)
+        segments, a, b = np.repeat(segments, 2), np.ravel(np.column_stack((a, middle))), np.ravel(np.column_stack((middle, b)))
+    return ArcLengths(lengths, errors, evaluations)
+
+if __name__ == "__main__":
+    P0, P1, P2, P3 = np.array([-12, -36]), np.array([-12, -52]), np.array([-26, -36]), np.array([-36, -60])
+    arc_length = bezier_arclength(P0, P1, P2, P3, 0.5, 0.7)
+    real_arc_length = bezier_real_arc_len(P0, P1, P2, P3, 0.5, 0.7)
+    print(arc_length, real_arc_length)
\ No newline at end of file
@@ -0,0 +1,187 @@
+from collections import namedtuple
+from weakref import WeakKeyDictionary
+import numpy as np
+import delauney as dlny
+import instrumentation
+from geometrycache import content_hash
+
+# midpoints: (K, 2) array of the ordered midpoints, edges: (K, 2) array of the cone indices of their internal edges
+# closed: True if the centerline goes around a closed lap, the last midpoint then connects back to the first
+Centerline = namedtuple("Centerline", ["midpoints", "edges", "closed"])
+
+# centerlines already built, per triangulation object and then per (hash of cones and colors, max_gap, max_width)
+_cache = WeakKeyDictionary()
+
+def _walk_chains(simplices, neighbors, internal):
+    # follows the internal edges from triangle to triangle, a triangle has at most two internal edges
+    # so the internal edges form chains (or loops) across the triangles. A chain ends on the hull or
+    # in a triangle with a single internal edge (where the other one was too long to count)
+    # returns a list of (chain, is_loop), a chain being a list of (triangle, local edge) pairs in order
+    internal_count = internal.sum(axis=1)
+    neighbors_list = neighbors.tolist()
+    internal_list = internal.tolist()
+    visited = np.zeros(len(simplices), dtype=bool)
+
+    def follow(triangle, entry):
+        # walks from triangle, entered through local edge entry, until the hull or a visited triangle
+        chain = []
+        while triangle != -1 and not visited[triangle]:
+            visited[triangle] = True
+            exit_edge = next((k for k in range(3) if internal_list[triangle][k] and k != entry), None)
+            if exit_edge is None:
+                break
+            chain.append((triangle, exit_edge))
+            following = neighbors_list[triangle][exit_edge]
+            if following != -1:
+                entry = neighbors_list[following].index(triangle)
+            triangle = following
+        return chain, triangle
+
+    chains = []
+    # chains start on the hull, at an internal edge with no triangle on its other side
+    hull_starts = np.argwhere(internal & (neighbors == -1))
+    for triangle, entry in hull_starts.tolist():
+        if not visited[triangle]:
+            chain, _ = follow(triangle, entry)
+            chains.append(([(triangle, entry)] + chain, False))
+    for triangle in np.flatnonzero(internal_count == 1).tolist():
+        if not visited[triangle]:
+            chains.append((follow(triangle, -1)[0], False))
+
+    # everything left over goes around in loops, a closed track is one of them
+    for triangle in np.flatnonzero((internal_count == 2) & ~visited).tolist():
+        if visited[triangle]:
+            continue
+        entry = next(k for k in range(3) if internal_list[triangle][k])
+        chain, end = follow(triangle, entry)
+        chains.append((chain, end == triangle))
+    return chains
+
+def _orient_chain(midpoints, yellow, blue):
+    # a chain is driven with the blue cones on the left (and yellow on the right), like a Formula Student track
+    if len(midpoints) < 2:
+        return False
+    direction = np.diff(midpoints, axis=0)
+    across = (blue - yellow)[:-1]
+    return np.sum(direction[:, 0] * across[:, 1] - direction[:, 1] * across[:, 0]) < 0
+
+def get_centerline(triangulation, cones=None, colors=None, max_gap=10.0, max_width=10.0):
+    """Orders the midpoints of the internal edges of a triangulation into one centerline
+
+    The internal edges are linked through the triangles they share (using triangulation.neighbors)
+    and walked from triangle to triangle, so every internal edge is used once and in the order
+    it comes along the track. The walk gives one chain per stretch of track between gaps in the
+    cones, plus short side chains where edges cut across the infield. The longest chain is then
+    extended with the chains whose ends are within max_gap of its ends, and the side chains are dropped.
+    The result is cached per triangulation object and cone array, so asking again for the same
+    triangulation is free. The cached arrays are shared by every caller, so they are read-only.
+
+    Parameters
+    ----------
+    triangulation: the Delauney triangulation object of the cones
+
+    cones: array of the cone coordinates, None uses triangulation.points
+
+    colors: the colour (delauney.YELLOW or delauney.BLUE) of every cone, None means the
+    yellow and blue cones alternate
+
+    max_gap: the longest distance between the ends of two chains that are stitched together,
+    also the longest distance between the last and the first midpoint of a closed lap
+
+    max_width: internal edges longer than this cut across the infield or the open ends of the
+    track instead of across the track, and are left out
+
+    Returns
+    -------
+    A Centerline (midpoints, edges, closed) of read-only arrays. The centerline runs with the
+    blue cones on the left.
+    """
+    cones = np.asarray(triangulation.points if cones is None else cones, dtype=float)
+    colors = dlny.get_alternating_colors(len(cones)) if colors is None else np.asarray(colors)
+    key = (content_hash(cones, colors), float(max_gap), float(max_width))
+    cached = _cache.get(triangulation)
+    if cached is not None and key in cached:
+        return cached[key]
+
+    started = instrumentation.start()
+    simplices = triangulation.simplices
+    neighbors = triangulation.neighbors
+    # local edge k of a triangle is the one opposite its vertex k
+    edge_vertices = np.stack((simplices[:, [1, 2]], simplices[:, [2, 0]], simplices[:, [0, 1]]), axis=1)
+    edge_vectors = cones[edge_vertices[:, :, 1]] - cones[edge_vertices[:, :, 0]]
+    internal = colors[edge_vertices[:, :, 0]] != colors[edge_vertices[:, :, 1]]
+    internal &= np.hypot(edge_vectors[:, :, 0], edge_vectors[:, :, 1]) <= max_width
+
+    pieces = []
+    for chain, is_loop in _walk_chains(simplices, neighbors, internal):
+        triangles, local_edges = np.array(chain, dtype=np.int64).reshape(-1, 2).T
+        edges = edge_vertices[triangles, local_edges]
+        # put the yellow cone first, so every edge reads yellow -> blue
+        swap = colors[edges[:, 0]] != dlny.YELLOW
+        edges[swap] = edges[swap][:, ::-1]
+        midpoints = dlny.find_midpoints_of_edge_indices(cones, edges)
+        if _orient_chain(midpoints, cones[edges[:, 0]], cones[edges[:, 1]]):
+            edges, midpoints = edges[::-1], midpoints[::-1]
+        pieces.append((edges, midpoints, is_loop))
+
+    if not pieces:
+        centerline = Centerline(np.empty((0, 2)), np.empty((0, 2), dtype=np.int64), False)
+    else:
+        centerline = _stitch(pieces, max_gap)
+
+    centerline.midpoints.setflags(write=False)
+    centerline.edges.setflags(write=False)
+    _cache.setdefault(triangulation, {})[key] = centerline
+    instrumentation.stop("centerline", started, {"chains": len(pieces)}, triangles=len(simplices), midpoints=len(centerline.midpoints))
+    return centerline
+
+def _stitch(pieces, max_gap):
+    # grows the longest chain with the chains that continue it, within max_gap of its ends
+    pieces = sorted(pieces, key=lambda piece: len(piece[0]), reverse=True)
+    edges, midpoints, closed = pieces[0]
+    if closed:
+        return Centerline(midpoints, edges, True)
+
+    parts_edges, parts_midpoints = [edges], [midpoints]
+    remaining = [piece for piece in pieces[1:] if not piece[2]]
+    while remaining:
+        head, tail = parts_midpoints[0][0], parts_midpoints[-1][-1]
+        # distance from the current tail to the start of every chain, and from every chain's end to the current head
+        after = [np.hypot(*(piece[1][0] - tail)) for piece in remaining]
+        before = [np.hypot(*(head - piece[1][-1])) for piece in remaining]
+        best_after, best_before = int(np.argmin(after)), int(np.argmin(before))
+        if after[best_after] <= max_gap and after[best_after] <= before[best_before]:
+            piece = remaining.pop(best_after)
+            parts_edges.append(piece[0])
+            parts_midpoints.append(piece[1])
+        elif before[best_before] <= max_gap:
+            piece = remaining.pop(best_before)
+            parts_edges.insert(0, piece[0])
+            parts_midpoints.insert(0, piece[1])
+        else:
+            break
+
+    edges = np.concatenate(parts_edges)
+    midpoints = np.concatenate(parts_midpoints)
+    closed = len(midpoints) > 2 and np.hypot(*(midpoints[0] - midpoints[-1])) <= max_gap
+    return Centerline(midpoints, edges, bool(closed))
+
+def find_centerline(cones, colors=None, max_gap=10.0, max_width=10.0):
+    """Triangulates the cones and returns their ordered centerline, see get_centerline
+
+    Parameters
+    ----------
+    cones: array of cone coordinates (e.g [[x1,y1], [x2,y2], etc...])
+
+    colors: the colour of every cone, None means the yellow and blue cones alternate
+
+    max_gap: the longest gap in the centerline that is bridged
+
+    max_width: the longest internal edge that is used
+
+    Returns
+    -------
+    A Centerline (midpoints, edges, closed)
+    """
+    cones = np.asarray(cones, dtype=float)
+    return get_centerline(dlny.get_triangulation_from_cones(cones), cones, colors, max_gap, max_width)
@@ -0,0 +1,234 @@
+from bisect import bisect_left, bisect_right
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+import delauney as dlny
+
+# one record per cone, x and y next to each other so the positions can be viewed as an (N, 2) array
+CONE_DTYPE = np.dtype([("x", np.float64), ("y", np.float64), ("color", np.int8), ("confidence", np.float32), ("id", np.int64)])
+
+class ConeMap:
+    """Cone map stored as one structured NumPy array of (x, y, color, confidence, id) records
+
+    The cones are kept grouped by colour and sorted by x inside every colour, so all the cones
+    of one colour, or of one colour within a range of x, are a contiguous slice of the array and
+    are returned as views without copying. The colour is stored with every cone, nothing depends
+    on the yellow and blue cones alternating.
+
+    Every cone gets an id that stays the same for as long as it is in the map. The map can be
+    saved with save and opened again with ConeMap.load, which memory-maps the file, so even the
+    map of a whole season of logs opens instantly and only the parts that are used are read.
+    """
+    def __init__(self, cones=None):
+        self._cones = np.empty(0, dtype=CONE_DTYPE)
+        self._next_id = 0
+        if cones is not None:
+            self._set(np.asarray(cones, dtype=CONE_DTYPE))
+
+    def _set(self, cones):
+        # stores the records in colour then x order, np.lexsort sorts by its last key first
+        order = np.lexsort((cones["x"], cones["color"]))
+        self._cones = cones[order]
+        self._next_id = int(cones["id"].max()) + 1 if len(cones) else 0
+
+    @classmethod
+    def from_yellow_and_blue(cls, yellow_cones, blue_cones, confidence=1.0):
+        """Builds a map from a list of yellow cones and a list of blue cones, which can have different lengths
+
+        Parameters
+        ----------
+        yellow_cones: the list of yellow cone coordinates (e.g [[x1,y1], [x2,y2], etc...])
+
+        blue_cones: the list of blue cone coordinates (e.g [[x1,y1], [x2,y2], etc...])
+
+        confidence: the detection confidence given to every cone
+
+        Returns
+        -------
+        A ConeMap, the yellow cones get the ids 0 to len(yellow_cones) - 1 and the blue cones the ids after them
+        """
+        yellow_cones = np.asarray(yellow_cones, dtype=float).reshape(-1, 2)
+        blue_cones = np.asarray(blue_cones, dtype=float).reshape(-1, 2)
+        colors = np.repeat([dlny.YELLOW, dlny.BLUE], [len(yellow_cones), len(blue_cones)])
+        cone_map = cls()
+        cone_map.append(np.concatenate((yellow_cones, blue_cones)), colors, confidence)
+        return cone_map
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Opens a map written by save
+
+        Parameters
+        ----------
+        path: the .npy file of the map
+
+        mmap_mode: passed to np.load, "r" maps the file read-only without reading it,
+        None reads the whole map into memory
+
+        Returns
+        -------
+        A ConeMap backed by the file. Appending or deleting cones makes an in-memory copy,
+        the file is only changed by saving again.
+        """
+        cones = np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+        if cones.dtype != CONE_DTYPE:
+            raise ValueError(f"{path} is not a cone map, its records are {cones.dtype}")
+        # the file was written sorted, so it is used as is and not read until it is needed
+        return cls.from_records(cones)
+
+    @classmethod
+    def from_records(cls, records):
+        """Wraps the records of a map (e.g the records of another ConeMap) without copying or sorting them
+
+        Parameters
+        ----------
+        records: a structured array of CONE_DTYPE records, already grouped by colour and sorted by x
+
+        Returns
+        -------
+        A ConeMap backed by records
+        """
+        cone_map = cls()
+        cone_map._cones = records
+        # the next free id is only looked up when cones are appended
+        cone_map._next_id = None
+        return cone_map
+
+    def save(self, path):
+        """Writes the map to a .npy file that ConeMap.load can memory-map
+
+        Parameters
+        ----------
+        path: the file to write
+        """
+        np.save(path, np.ascontiguousarray(self._cones), allow_pickle=False)
+
+    def __len__(self):
+        return len(self._cones)
+
+    @property
+    def records(self):
+        """The structured array of all the cones, grouped by colour and sorted by x inside every colour"""
+        return self._cones
+
+    @property
+    def cones(self):
+        """(N, 2) view of the (x,y) coordinates of the cones, in the order of records"""
+        return structured_to_unstructured(self._cones[["x", "y"]], copy=False)
+
+    @property
+    def colors(self):
+        """The colour of every cone, in the order of records"""
+        return self._cones["color"]
+
+    @property
+    def ids(self):
+        """The id of every cone, in the order of records"""
+        return self._cones["id"]
+
+    def _color_bounds(self, color):
+        # bisect probes single records, np.searchsorted would first copy the whole strided column
+        # (and so read the whole file of a memory-mapped map)
+        colors = self._cones["color"]
+        return bisect_left(colors, color), bisect_right(colors, color)
+
+    def by_color(self, color):
+        """Returns a view of the records of every cone of one colour (e.g delauney.BLUE), sorted by x"""
+        start, stop = self._color_bounds(color)
+        return self._cones[start:stop]
+
+    def region(self, color, x_min=-np.inf, x_max=np.inf):
+        """Returns a view of the records of the cones of one colour with x_min <= x <= x_max, sorted by x
+
+        Parameters
+        ----------
+        color: the colour of the cones
+
+        x_min, x_max: the range of x
+        """
+        group = self.by_color(color)
+        x = group["x"]
+        return group[bisect_left(x, x_min):bisect_right(x, x_max)]
+
+    def in_box(self, x_min, y_min, x_max, y_max, color=None):
+        """Returns the records of the cones inside an axis-aligned box
+
+        The x range of every colour is a view (see region), the y range is then picked out of it,
+        so unlike by_color and region the result is a copy.
+
+        Parameters
+        ----------
+        x_min, y_min, x_max, y_max: the corners of the box
+
+        color: only return the cones of this colour, None returns every colour
+
+        Returns
+        -------
+        A structured array of the records in the box, grouped by colour and sorted by x
+        """
+        colors = np.unique(self._cones["color"]) if color is None else [color]
+        parts = []
+        for c in colors:
+            band = self.region(c, x_min, x_max)
+            parts.append(band[(band["y"] >= y_min) & (band["y"] <= y_max)])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=CONE_DTYPE)
+
+    def append(self, cones, colors, confidence=1.0, ids=None):
+        """Adds cones to the map
+
+        The new cones are merged into their place in the sorted array, so appending k cones to a
+        map of n costs one O(n + k log k) copy and no re-sort of the whole map.
+
+        Parameters
+        ----------
+        cones: array of the (x,y) coordinates of the new cones
+
+        colors: the colour of every new cone, or one colour for all of them
+
+        confidence: the detection confidence of every new cone, or one confidence for all of them
+
+        ids: the ids of the new cones, None gives them the next free ids
+
+        Returns
+        -------
+        The array of ids of the new cones, in the order they were given
+        """
+        cones = np.asarray(cones, dtype=float).reshape(-1, 2)
+        new = np.empty(len(cones), dtype=CONE_DTYPE)
+        new["x"], new["y"] = cones[:, 0], cones[:, 1]
+        new["color"] = colors
+        new["confidence"] = confidence
+        if self._next_id is None:
+            self._next_id = int(self._cones["id"].max()) + 1 if len(self._cones) else 0
+        if ids is None:
+            new["id"] = np.arange(self._next_id, self._next_id + len(new))
+        else:
+            new["id"] = ids
+        if len(new):
+            self._next_id = max(self._next_id, int(new["id"].max()) + 1)
+
+        new_sorted = new[np.lexsort((new["x"], new["color"]))]
+        # insert every new cone after the cones of its colour with a smaller or equal x
+        positions = np.empty(len(new_sorted), dtype=np.intp)
+        for color in np.unique(new_sorted["color"]):
+            start, stop = self._color_bounds(color)
+            same = new_sorted["color"] == color
+            positions[same] = start + np.searchsorted(self._cones["x"][start:stop], new_sorted["x"][same], "right")
+        self._cones = np.insert(self._cones, positions, new_sorted)
+        return new["id"].copy()
+
+    def delete(self, ids):
+        """Removes cones from the map
+
+        Parameters
+        ----------
+        ids: the ids of the cones to remove, ids that are not in the map are ignored
+
+        Returns
+        -------
+        The number of cones removed
+        """
+        remove = np.isin(self._cones["id"], np.asarray(ids, dtype=np.int64))
+        removed = int(remove.sum())
+        if removed:
+            self._cones = self._cones[~remove]
+        return removed
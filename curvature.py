@@ -15,10 +15,11 @@ def circle_equation(x1, y1, x2, y2, angle):
     return (h_value, k_value, r_squared**0.5)
 
 
-x1, y1 = 12, 23  # First point on the circle
-x2, y2 = 32, 41  # Second point on the circle
-angle = math.pi / 3 #heading of the robot (or something else) on the first point on the circle
+if __name__ == "__main__":
+    x1, y1 = 12, 23  # First point on the circle
+    x2, y2 = 32, 41  # Second point on the circle
+    angle = math.pi / 3 #heading of the robot (or something else) on the first point on the circle
 
-# Get the equation of the circle
-h, k, r = circle_equation(x1, y1, x2, y2, angle)
-print(f"Center: ({h}, {k}), Radius: {r}")
\ No newline at end of file
+    # Get the equation of the circle
+    h, k, r = circle_equation(x1, y1, x2, y2, angle)
+    print(f"Center: ({h}, {k}), Radius: {r}")
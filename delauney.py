@@ -1,5 +1,12 @@
-from scipy.spatial import Delaunay
+from collections import namedtuple
+from fractions import Fraction
+from itertools import chain
 import numpy as np
+import instrumentation
+
+# cone colours in the per-cone colour arrays
+YELLOW = 0
+BLUE = 1
 
 def get_triangulation_from_cones(cones):
   """Gets a Delauney triangulation object given an array of cone coordinates
@@ -12,7 +19,12 @@ def get_triangulation_from_cones(cones):
   -------
   Triangulation object given by scipy
   """
-  return Delaunay(cones)
+  # scipy.spatial is slow to import, so it is only loaded once a triangulation is needed
+  from scipy.spatial import Delaunay
+  started = instrumentation.start()
+  triangulation = Delaunay(cones)
+  instrumentation.stop("delaunay", started, cones=len(cones))
+  return triangulation
 
 def get_midpoint(p1, p2):
   """Returns the midpoint of two given points
@@ -48,6 +60,117 @@ def get_triangle_containing_point(point, cones, triangulation):
   indices = triangulation.simplices[triangulation.find_simplex(point)]
   return cones[indices[0]], cones[indices[1]], cones[indices[2]]
 
+# result of a batched point location, one row per point
+# simplices: (N,) index of the triangle containing each point, -1 outside the hull
+# barycentric: (N, 3) barycentric coordinates of each point in its triangle, NaN outside the hull
+# vertices: (N, 3) cone indices of the corners of each triangle, -1 outside the hull
+# outside: (N,) True for the points outside the hull of the cones
+PointLocation = namedtuple("PointLocation", ["simplices", "barycentric", "vertices", "outside"])
+
+def _barycentric(triangulation, simplices, points):
+  # barycentric coordinates of points in the given triangles, from the affine maps in triangulation.transform
+  transform = triangulation.transform[simplices]
+  dx = points[:, 0] - transform[:, 2, 0]
+  dy = points[:, 1] - transform[:, 2, 1]
+  coordinates = np.empty((len(points), 3))
+  coordinates[:, 0] = transform[:, 0, 0] * dx + transform[:, 0, 1] * dy
+  coordinates[:, 1] = transform[:, 1, 0] * dx + transform[:, 1, 1] * dy
+  coordinates[:, 2] = 1 - coordinates[:, 0] - coordinates[:, 1]
+  return coordinates
+
+def locate_points(triangulation, points, hints=None, tolerance=None):
+  """Finds the triangles containing many points at once
+
+  Parameters
+  ----------
+  triangulation: the Delauney triangulation object of the cones
+
+  points: (N, 2) array of (x,y) points
+
+  hints: optional (N,) array of triangle indices to try first, e.g the triangles the same points
+  were in last time. Points found in their hint triangle or one of its neighbours skip find_simplex.
+
+  tolerance: how far outside a triangle (in barycentric coordinates) a point still counts as inside,
+  None uses the default of find_simplex
+
+  Returns
+  -------
+  A PointLocation (simplices, barycentric, vertices, outside)
+  """
+  started = instrumentation.start()
+  points = np.asarray(points, dtype=float).reshape(-1, 2)
+  tolerance = 100 * np.finfo(float).eps if tolerance is None else tolerance
+  no_points = len(points)
+  simplices = np.full(no_points, -1, dtype=np.intp)
+  barycentric = np.full((no_points, 3), np.nan)
+  missing = np.arange(no_points)
+
+  if hints is not None and no_points:
+    # try the hint triangle and then its three neighbours, walking one step towards the point
+    hints = np.asarray(hints, dtype=np.intp)
+    neighbors = triangulation.neighbors
+    candidates = np.column_stack((hints, neighbors[np.maximum(hints, 0)]))
+    candidates[hints < 0] = -1
+    tries = np.flatnonzero(hints >= 0)
+    for column in range(4):
+      trying = candidates[tries, column]
+      valid = trying >= 0
+      coordinates = _barycentric(triangulation, trying[valid], points[tries[valid]])
+      inside = np.zeros(len(tries), dtype=bool)
+      inside[valid] = (coordinates >= -tolerance).all(axis=1)
+      simplices[tries[inside]] = trying[inside]
+      barycentric[tries[inside]] = coordinates[inside[valid]]
+      tries = tries[~inside]
+      if tries.size == 0:
+        break
+    missing = np.flatnonzero(simplices < 0)
+
+  if missing.size:
+    found = triangulation.find_simplex(points[missing], tol=tolerance)
+    simplices[missing] = found
+    inside = found >= 0
+    barycentric[missing[inside]] = _barycentric(triangulation, found[inside], points[missing[inside]])
+
+  outside = simplices < 0
+  vertices = triangulation.simplices[np.maximum(simplices, 0)]
+  vertices[outside] = -1
+  instrumentation.stop("locate_points", started, {"find_simplex": int(missing.size)}, points=no_points)
+  return PointLocation(simplices, barycentric, vertices, outside)
+
+class PointLocator:
+  """Batched point location that remembers where the points were found last time
+
+  Points that are queried every frame (vehicle pose samples, the planned trajectory, lidar
+  returns) only move a little between frames, so the triangle each point was in last frame is
+  tried first, then its neighbours, and find_simplex only runs for the points that moved further.
+  """
+  def __init__(self, triangulation, tolerance=None):
+    self.tolerance = tolerance
+    self.set_triangulation(triangulation)
+
+  def set_triangulation(self, triangulation):
+    # the old hints mean nothing in a new triangulation
+    self.triangulation = triangulation
+    self._hints = None
+
+  def locate(self, points):
+    """Locates the points like locate_points, using the last results as hints when the
+    number of points is the same as last time
+
+    Parameters
+    ----------
+    points: (N, 2) array of (x,y) points
+
+    Returns
+    -------
+    A PointLocation (simplices, barycentric, vertices, outside)
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    hints = self._hints if self._hints is not None and len(self._hints) == len(points) else None
+    location = locate_points(self.triangulation, points, hints, self.tolerance)
+    self._hints = location.simplices
+    return location
+
 def get_triangles_from_triangulation(triangulation, cones):
   """Given a triangulation object and a cones array, returns all the triangles
   formed by the triangulation
@@ -62,10 +185,12 @@ def get_triangles_from_triangulation(triangulation, cones):
   -------
   A set where each element is three points (the points that make up the triangles)
   """
+  started = instrumentation.start()
   tri = triangulation.simplices
   triangles = []
   for t in tri:
     triangles.append([cones[t[0]], cones[t[1]], cones[t[2]]])
+  instrumentation.stop("triangles", started, triangles=len(triangles))
   return triangles
 
 def generate_edges_from_triangles(triangles):
@@ -83,11 +208,13 @@ def generate_edges_from_triangles(triangles):
   A list of all the triangle edges, where each element contains the
   start and end point of the edge
   """
+  started = instrumentation.start()
   edges = []
   for triangle in triangles:
     edges.append((triangle[0], triangle[1]))
     edges.append((triangle[0], triangle[2]))
     edges.append((triangle[1], triangle[2]))
+  instrumentation.stop("edges", started, triangles=len(triangles), edges=len(edges))
   return edges
 
 def find_internal_edges(edges, cones):
@@ -107,6 +234,7 @@ def find_internal_edges(edges, cones):
   A list of all the internal triangle edges, where each element contains the
   start and end point of the edge
   """
+  started = instrumentation.start()
   internal_edges = []
 
   yellow_cones = {tuple(cone) for cone in cones[::2]}
@@ -114,6 +242,7 @@ def find_internal_edges(edges, cones):
   for edge in edges:
     if (tuple(edge[0]) in yellow_cones and tuple(edge[1]) in blue_cones) or (tuple(edge[0]) in blue_cones and tuple(edge[1]) in yellow_cones):
       internal_edges.append(edge)
+  instrumentation.stop("internal_edges", started, edges=len(edges), cones=len(cones), internal_edges=len(internal_edges))
   return internal_edges
 
 def find_midpoints_of_internal_edges(edges):
@@ -128,11 +257,618 @@ def find_midpoints_of_internal_edges(edges):
   -------
   A list of all midpoints of the internal triangle edges, where each element is an (x,y) coordinate point
   """
+  started = instrumentation.start()
   midpoints = []
   for edge in edges:
     midpoints.append(get_midpoint(edge[0], edge[1]))
+  instrumentation.stop("edge_midpoints", started, edges=len(edges))
+  return midpoints
+
+def get_alternating_colors(no_cones):
+  """Returns the colour array of a cone array where yellow and blue cones alternate
+  (as made by combine_yellow_and_blue_cones)
+
+  Parameters
+  ----------
+  no_cones: the number of cones
+
+  Returns
+  -------
+  Array with the colour (YELLOW or BLUE) of every cone
+  """
+  return (np.arange(no_cones) % 2).astype(np.int8)
+
+def get_edges_from_simplices(simplices):
+  """Given the (M, 3) simplex array of a triangulation, returns every triangle edge once
+  as a pair of cone indices
+
+  Parameters
+  ----------
+  simplices: the cone indices of every triangle (triangulation.simplices)
+
+  Returns
+  -------
+  An (E, 2) array of cone indices, the lower index first, sorted by the first and then
+  the second index. Edges shared by two triangles appear once.
+  """
+  simplices = np.asarray(simplices, dtype=np.int64)
+  if simplices.size == 0:
+    return np.empty((0, 2), dtype=np.int64)
+  no_cones = int(simplices.max()) + 1
+  edges = np.concatenate((simplices[:, [0, 1]], simplices[:, [0, 2]], simplices[:, [1, 2]]))
+  edges.sort(axis=1)
+  # one integer per edge, so np.unique can drop the second copy of every shared edge
+  keys = np.unique(edges[:, 0] * no_cones + edges[:, 1])
+  return np.column_stack((keys // no_cones, keys % no_cones))
+
+def find_internal_edge_indices(edges, colors):
+  """Given an (E, 2) array of edges as cone indices and the colour of every cone,
+  returns the internal edges (the edges between a yellow and a blue cone)
+
+  Parameters
+  ----------
+  edges: (E, 2) array of cone indices, e.g from get_edges_from_simplices
+
+  colors: the colour of every cone, e.g from get_alternating_colors
+
+  Returns
+  -------
+  The rows of edges that connect two cones of different colours
+  """
+  colors = np.asarray(colors)
+  return edges[colors[edges[:, 0]] != colors[edges[:, 1]]]
+
+def find_midpoints_of_edge_indices(cones, edges):
+  """Returns the midpoints of edges given as cone indices
+
+  Parameters
+  ----------
+  cones: array of cone coordinates (e.g [[x1,y1], [x2,y2], etc...])
+
+  edges: (E, 2) array of cone indices
+
+  Returns
+  -------
+  An (E, 2) array with the (x,y) midpoint of every edge
+  """
+  return np.asarray(cones, dtype=float)[edges].mean(axis=1)
+
+def get_edge_coordinates(cones, edges):
+  """Turns edges given as cone indices into the list of coordinate pairs used by
+  find_internal_edges and find_midpoints_of_internal_edges
+
+  Parameters
+  ----------
+  cones: array of cone coordinates (e.g [[x1,y1], [x2,y2], etc...])
+
+  edges: (E, 2) array of cone indices
+
+  Returns
+  -------
+  A list of edges, where each element contains the start and end point of the edge
+  """
+  cones = np.asarray(cones, dtype=float)
+  return [(cones[i], cones[j]) for i, j in edges.tolist()]
+
+def find_internal_midpoints(cones, colors=None):
+  """Triangulates the cones and returns the midpoint of every internal edge, all in array operations
+
+  Parameters
+  ----------
+  cones: array of cone coordinates (e.g [[x1,y1], [x2,y2], etc...])
+
+  colors: the colour of every cone, None means yellow and blue cones alternate
+
+  Returns
+  -------
+  A tuple (midpoints, edges), the (E, 2) array of midpoints and the (E, 2) array of the
+  cone indices of their internal edges, ordered by cone index (not along the track)
+  """
+  cones = np.asarray(cones, dtype=float)
+  if colors is None:
+    colors = get_alternating_colors(len(cones))
+  edges = get_edges_from_simplices(get_triangulation_from_cones(cones).simplices)
+  edges = find_internal_edge_indices(edges, colors)
+  return find_midpoints_of_edge_indices(cones, edges), edges
+
+def find_track_midpoints(cones, closed=False, max_gap=3):
+  """Triangulates all the cones at once and returns the midpoints of the internal edges
+  in the order they come along the track
+
+  Parameters
+  ----------
+  cones: array of cone coordinates (e.g [[x1,y1], [x2,y2], etc...]).
+           The yellow and blue cones alternate positions in the array and follow the track.
+
+  closed: if True the cones go around a closed lap, so edges between the last and the
+  first cone pairs are kept and come last
+
+  max_gap: the most cone pairs a yellow and a blue cone can be apart along the track
+  for their edge to count, this drops edges that cut across the infield
+
+  Returns
+  -------
+  Array of (x,y) midpoints, one per internal edge. Every edge is only used once, even
+  though it is shared by two triangles.
+  """
+  started = instrumentation.start()
+  cones = np.asarray(cones, dtype=float)
+  no_cones = len(cones)
+  _, edges = find_internal_midpoints(cones)
+
+  # yellow cones are at even positions, blue cones at odd ones
+  yellow_first = edges[:, 0] % 2 == 0
+  yellow = np.where(yellow_first, edges[:, 0], edges[:, 1]) // 2
+  blue = np.where(yellow_first, edges[:, 1], edges[:, 0]) // 2
+
+  # order the edges by the sum of their pair indices, which grows by one for every edge along the track
+  gap = blue - yellow
+  position = yellow + blue
+  if closed:
+    no_pairs = no_cones // 2
+    gap = (gap + no_pairs // 2) % no_pairs - no_pairs // 2
+    position = (2 * yellow + gap) % (2 * no_pairs)
+  keep = np.abs(gap) <= max_gap
+  edges, position, yellow = edges[keep], position[keep], yellow[keep]
+  edges = edges[np.lexsort((yellow, position))]
+  midpoints = find_midpoints_of_edge_indices(cones, edges)
+  instrumentation.stop("track_midpoints", started, cones=no_cones, midpoints=len(midpoints))
   return midpoints
 
+# what changed in the internal edges of an IncrementalTriangulator
+# cone_ids: the ids of the cones that were added or dropped
+# added_edges: (K, 2) array of cone id pairs of the new internal edges, added_midpoints: their (K, 2) midpoints
+# removed_edges: (R, 2) array of cone id pairs of the internal edges that are gone
+MidpointUpdate = namedtuple("MidpointUpdate", ["cone_ids", "added_edges", "added_midpoints", "removed_edges"])
+
+# vertex standing in for the point at infinity, every hull edge gets a triangle with it
+_GHOST = -1
+_EPSILON = 2.0 ** -53
+_ORIENT_BOUND = (3.0 + 16.0 * _EPSILON) * _EPSILON
+_INCIRCLE_BOUND = (10.0 + 96.0 * _EPSILON) * _EPSILON
+
+def _orient(a, b, c):
+  # > 0 if a, b, c turn counterclockwise, < 0 if clockwise and 0 if they are on one line
+  # the float result is used when it is certain to have the right sign, otherwise it is redone exactly
+  left = (a[0] - c[0]) * (b[1] - c[1])
+  right = (a[1] - c[1]) * (b[0] - c[0])
+  det = left - right
+  if abs(det) > _ORIENT_BOUND * (abs(left) + abs(right)):
+    return det
+  a, b, c = [(Fraction(p[0]), Fraction(p[1])) for p in (a, b, c)]
+  return float((a[0] - c[0]) * (b[1] - c[1]) - (a[1] - c[1]) * (b[0] - c[0]))
+
+def _incircle(a, b, c, d):
+  # > 0 if d is inside the circle through the counterclockwise triangle a, b, c, 0 if it is on it
+  adx, ady = a[0] - d[0], a[1] - d[1]
+  bdx, bdy = b[0] - d[0], b[1] - d[1]
+  cdx, cdy = c[0] - d[0], c[1] - d[1]
+  bc = bdx * cdy - cdx * bdy
+  ca = cdx * ady - adx * cdy
+  ab = adx * bdy - bdx * ady
+  a_lift = adx * adx + ady * ady
+  b_lift = bdx * bdx + bdy * bdy
+  c_lift = cdx * cdx + cdy * cdy
+  det = a_lift * bc + b_lift * ca + c_lift * ab
+  permanent = ((abs(bdx * cdy) + abs(cdx * bdy)) * a_lift + (abs(cdx * ady) + abs(adx * cdy)) * b_lift
+               + (abs(adx * bdy) + abs(bdx * ady)) * c_lift)
+  if abs(det) > _INCIRCLE_BOUND * permanent:
+    return det
+  a, b, c, d = [(Fraction(p[0]), Fraction(p[1])) for p in (a, b, c, d)]
+  adx, ady = a[0] - d[0], a[1] - d[1]
+  bdx, bdy = b[0] - d[0], b[1] - d[1]
+  cdx, cdy = c[0] - d[0], c[1] - d[1]
+  return float((adx * adx + ady * ady) * (bdx * cdy - cdx * bdy) + (bdx * bdx + bdy * bdy) * (cdx * ady - adx * cdy)
+               + (cdx * cdx + cdy * cdy) * (adx * bdy - bdx * ady))
+
+class IncrementalTriangulator:
+  """Delauney triangulation of a cone map that grows as cones are detected
+
+  Every new cone is inserted with the Bowyer-Watson algorithm: the triangles whose circumcircle
+  contains the cone are removed and the hole is filled with triangles fanning out from the cone.
+  Only the triangles around the new cones are touched, so adding a cone costs the same however
+  big the map is. (SciPy's incremental Delaunay re-extracts the whole triangulation after every
+  add_points.) Points outside the hull are handled with ghost triangles on the hull edges.
+
+  Every cone gets an id that stays the same for as long as the cone is in the map, and every
+  update reports the internal edges (as pairs of cone ids) that appeared or disappeared.
+  Removing cones rebuilds the triangulation of the cones that are left with one SciPy call
+  (checked and, where rounding made it slightly off, repaired with the exact predicates), so
+  dropping the cones behind the car every so often keeps the map small.
+  """
+  def __init__(self):
+    self._points = np.empty((64, 2))
+    self._colors = np.empty(64, dtype=np.int8)
+    self._ids = np.empty(64, dtype=np.int64)
+    self._no_cones = 0
+    self._next_id = 0
+    self._clear()
+
+  @property
+  def cones(self):
+    """Array of the (x,y) coordinates of the cones in the map, in the order of ids"""
+    return self._points[:self._no_cones]
+
+  @property
+  def colors(self):
+    """The colour of every cone in the map"""
+    return self._colors[:self._no_cones]
+
+  @property
+  def ids(self):
+    """The id of every cone in the map, in increasing order"""
+    return self._ids[:self._no_cones]
+
+  def add_cones(self, cones, colors):
+    """Adds newly detected cones to the map
+
+    Parameters
+    ----------
+    cones: array of the new cone coordinates (e.g [[x1,y1], [x2,y2], etc...])
+
+    colors: the colour (YELLOW or BLUE) of every new cone, or one colour for all of them
+
+    Returns
+    -------
+    A MidpointUpdate with the ids given to the new cones and the internal edges they changed.
+    Until there are three cones that are not on one line there is no triangulation and
+    no edges are reported, the update that starts it reports the edges between all the
+    cones so far. A cone on top of another cone is kept in the map but not triangulated.
+    """
+    started = instrumentation.start()
+    cones = np.asarray(cones, dtype=float).reshape(-1, 2)
+    no_new = len(cones)
+    first_new = self._no_cones
+    self._reserve(first_new + no_new)
+    self._points[first_new:first_new + no_new] = cones
+    self._colors[first_new:first_new + no_new] = colors
+    self._ids[first_new:first_new + no_new] = np.arange(self._next_id, self._next_id + no_new)
+    self._no_cones += no_new
+    self._next_id += no_new
+
+    self._touched = {}
+    self._insert(range(first_new, self._no_cones))
+    update = self._update(self._ids[first_new:self._no_cones].copy())
+    instrumentation.stop("incremental_triangulation", started, {"added_edges": len(update.added_edges), "removed_edges": len(update.removed_edges)},
+                         new_cones=no_new, cones=self._no_cones)
+    return update
+
+  def drop_cones(self, cone_ids):
+    """Removes cones from the map and rebuilds the triangulation from the ones that are left,
+    see _rebuild
+
+    Parameters
+    ----------
+    cone_ids: the ids of the cones to drop, ids that are not in the map are ignored
+
+    Returns
+    -------
+    A MidpointUpdate with the dropped ids and the internal edges that changed
+    """
+    started = instrumentation.start()
+    keep = ~np.isin(self.ids, cone_ids)
+    dropped = self.ids[~keep].copy()
+    if dropped.size == 0:
+      return MidpointUpdate(dropped, np.empty((0, 2), dtype=np.int64), np.empty((0, 2)), np.empty((0, 2), dtype=np.int64))
+
+    old = self._internal_edge_keys()
+    no_kept = int(keep.sum())
+    self._points[:no_kept] = self.cones[keep]
+    self._colors[:no_kept] = self.colors[keep]
+    self._ids[:no_kept] = self.ids[keep]
+    self._no_cones = no_kept
+    self._rebuild()
+
+    # compare both edge sets by cone id, the vertex indices changed with the rebuild
+    ids = self.ids
+    new = self._internal_edge_keys()
+    added = np.column_stack(np.divmod(np.setdiff1d(new, old, assume_unique=True), self._next_id)).reshape(-1, 2)
+    removed = np.column_stack(np.divmod(np.setdiff1d(old, new, assume_unique=True), self._next_id)).reshape(-1, 2)
+    update = MidpointUpdate(dropped, added, find_midpoints_of_edge_indices(self.cones, np.searchsorted(ids, added)), removed)
+    instrumentation.stop("incremental_triangulation", started, {"rebuilt": 1}, dropped_cones=dropped.size, cones=self._no_cones)
+    return update
+
+  def drop_cones_behind(self, position, direction, margin=0.0):
+    """Drops the cones more than margin behind position, looking along direction
+
+    Parameters
+    ----------
+    position: the (x,y) position of the car
+
+    direction: the (x,y) direction the car is heading in, it does not have to be a unit vector
+
+    margin: how far behind the car a cone has to be to be dropped
+
+    Returns
+    -------
+    A MidpointUpdate, see drop_cones
+    """
+    direction = np.asarray(direction, dtype=float)
+    along = (self.cones - np.asarray(position, dtype=float)) @ (direction / np.hypot(direction[0], direction[1]))
+    return self.drop_cones(self.ids[along < -margin])
+
+  def get_internal_midpoints(self):
+    """Returns every internal edge of the current triangulation
+
+    Returns
+    -------
+    A tuple (edges, midpoints), the (E, 2) array of cone id pairs and the (E, 2) array of midpoints
+    """
+    edges = np.array(sorted(self._internal_edges()), dtype=np.int64).reshape(-1, 2)
+    return self.ids[edges], find_midpoints_of_edge_indices(self.cones, edges)
+
+  def get_triangles(self):
+    """Returns every triangle of the current triangulation as a (T, 3) array of cone ids, counterclockwise"""
+    triangles = [(a, b, c) for (a, b), c in self._triangles.items() if 0 <= a < b and a < c]
+    return self.ids[np.array(triangles, dtype=np.int64).reshape(-1, 3)]
+
+  def _clear(self):
+    # _triangles maps every directed edge (a, b) of a counterclockwise triangle (a, b, c) to c,
+    # hull edges have a ghost triangle on the outside
+    self._triangles = {}
+    self._vertices = []
+    self._pending = []
+    self._hint = None
+    self._started_with = ()
+    self._touched = {}
+
+  def _rebuild(self):
+    # triangulates all the cones in the map again. SciPy gives the triangles, they are turned into the
+    # directed edge map and every edge that rounding may have left not quite Delaunay is flipped with the
+    # exact predicates. Without a SciPy triangulation (fewer than three cones off one line) or with
+    # a triangle that is flat in exact arithmetic, the cones are inserted one by one instead
+    from scipy.spatial import QhullError
+    self._clear()
+    no_cones = self._no_cones
+    points = self.cones
+    vertices = self._vertices
+    vertices.extend(map(tuple, points.tolist()))
+    try:
+      triangulation = get_triangulation_from_cones(points)
+    except (QhullError, ValueError):
+      self._insert(range(no_cones))
+      return
+
+    # qhull leaves out the cones on top of another cone, the first of them is kept like _insert_vertex does.
+    # Any other cone it left out (qhull rounding) is inserted the usual way at the end
+    simplices = triangulation.simplices.astype(np.int64)
+    skipped = []
+    for point, _, vertex in triangulation.coplanar.tolist():
+      if vertices[point] != vertices[vertex]:
+        skipped.append(point)
+      elif point < vertex:
+        simplices[simplices == vertex] = point
+
+    # turn every triangle counterclockwise, using the exact orientation where the float one is unsure
+    a, b, c = points[simplices[:, 0]], points[simplices[:, 1]], points[simplices[:, 2]]
+    left = (a[:, 0] - c[:, 0]) * (b[:, 1] - c[:, 1])
+    right = (a[:, 1] - c[:, 1]) * (b[:, 0] - c[:, 0])
+    orientation = left - right
+    for i in np.flatnonzero(np.abs(orientation) <= _ORIENT_BOUND * (np.abs(left) + np.abs(right))).tolist():
+      orientation[i] = _orient(vertices[simplices[i, 0]], vertices[simplices[i, 1]], vertices[simplices[i, 2]])
+    if np.any(orientation == 0):
+      self._clear()
+      self._insert(range(no_cones))
+      return
+    clockwise = orientation < 0
+    simplices[clockwise] = simplices[clockwise][:, [0, 2, 1]]
+
+    # every directed edge of every triangle, and a ghost triangle outside every hull edge
+    starts = simplices.T.ravel()
+    ends = simplices[:, [1, 2, 0]].T.ravel()
+    opposite = simplices[:, [2, 0, 1]].T.ravel()
+    keys = starts * no_cones + ends
+    order = np.argsort(keys)
+    reverse = order[np.minimum(np.searchsorted(keys[order], ends * no_cones + starts), len(keys) - 1)]
+    interior = keys[reverse] == ends * no_cones + starts
+    hull = ~interior
+    triangles = self._triangles
+    triangles.update(zip(zip(starts.tolist(), ends.tolist()), opposite.tolist()))
+    hull_starts, hull_ends = starts[hull].tolist(), ends[hull].tolist()
+    triangles.update(zip(zip(hull_ends, hull_starts), [_GHOST] * len(hull_starts)))
+    triangles.update(zip(zip(hull_starts, [_GHOST] * len(hull_starts)), hull_ends))
+    triangles.update(zip(zip([_GHOST] * len(hull_starts), hull_ends), hull_starts))
+    self._hint = (int(starts[0]), int(ends[0]))
+
+    # the edges whose far vertex may be inside the circumcircle of the near triangle, by the float incircle
+    # test and its error bound, are checked exactly and flipped until every edge is locally Delaunay
+    candidates = np.flatnonzero(interior & (starts < ends))
+    a, b, c = points[starts[candidates]], points[ends[candidates]], points[opposite[candidates]]
+    d = points[opposite[reverse[candidates]]]
+    ad, bd, cd = a - d, b - d, c - d
+    bc = bd[:, 0] * cd[:, 1] - cd[:, 0] * bd[:, 1]
+    ca = cd[:, 0] * ad[:, 1] - ad[:, 0] * cd[:, 1]
+    ab = ad[:, 0] * bd[:, 1] - bd[:, 0] * ad[:, 1]
+    a_lift, b_lift, c_lift = (ad * ad).sum(axis=1), (bd * bd).sum(axis=1), (cd * cd).sum(axis=1)
+    det = a_lift * bc + b_lift * ca + c_lift * ab
+    permanent = ((np.abs(bd[:, 0] * cd[:, 1]) + np.abs(cd[:, 0] * bd[:, 1])) * a_lift
+                 + (np.abs(cd[:, 0] * ad[:, 1]) + np.abs(ad[:, 0] * cd[:, 1])) * b_lift
+                 + (np.abs(ad[:, 0] * bd[:, 1]) + np.abs(bd[:, 0] * ad[:, 1])) * c_lift)
+    suspect = candidates[det >= -_INCIRCLE_BOUND * permanent]
+    self._legalize(list(zip(starts[suspect].tolist(), ends[suspect].tolist())))
+
+    for point in skipped:
+      self._insert_vertex(point)
+
+  def _legalize(self, edges):
+    # flips every edge in edges (and the edges around every flip) that is not locally Delaunay
+    vertices = self._vertices
+    triangles = self._triangles
+    while edges:
+      a, b = edges.pop()
+      c, d = triangles.get((a, b)), triangles.get((b, a))
+      if c is None or d is None or c == _GHOST or d == _GHOST:
+        continue
+      if _incircle(vertices[a], vertices[b], vertices[c], vertices[d]) > 0:
+        self._delete_triangle(a, b, c)
+        self._delete_triangle(b, a, d)
+        self._add_triangle(c, a, d)
+        self._add_triangle(c, d, b)
+        edges.extend(((a, d), (d, b), (b, c), (c, a)))
+
+  def _reserve(self, no_cones):
+    # grows the cone buffers by doubling, so adding a few cones doesn't copy the whole map
+    if no_cones <= len(self._points):
+      return
+    capacity = max(no_cones, 2 * len(self._points))
+    for name in ("_points", "_colors", "_ids"):
+      old = getattr(self, name)
+      new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+      new[:self._no_cones] = old[:self._no_cones]
+      setattr(self, name, new)
+
+  def _internal_edges(self):
+    colors = self._colors
+    return {(a, b) for a, b in self._triangles if 0 <= a < b and colors[a] != colors[b]}
+
+  def _internal_edge_keys(self):
+    # every internal edge as one integer, lower cone id * _next_id + higher cone id
+    triangles = self._triangles
+    edges = np.fromiter(chain.from_iterable(triangles), dtype=np.int64, count=2 * len(triangles)).reshape(-1, 2)
+    edges = edges[(edges[:, 0] >= 0) & (edges[:, 0] < edges[:, 1])]
+    colors = self.colors
+    edges = self.ids[edges[colors[edges[:, 0]] != colors[edges[:, 1]]]]
+    return np.sort(edges[:, 0] * self._next_id + edges[:, 1])
+
+  def _update(self, cone_ids):
+    # net change of the internal edges since _touched was reset: an edge is added if it is there
+    # now and was not before the first triangle on it was made or deleted, and removed the other way round
+    colors = self._colors
+    triangles = self._triangles
+    added, removed = [], []
+    for edge, existed in self._touched.items():
+      if colors[edge[0]] == colors[edge[1]]:
+        continue
+      exists = edge in triangles or edge[::-1] in triangles
+      if exists and not existed:
+        added.append(edge)
+      elif existed and not exists:
+        removed.append(edge)
+    added = np.array(sorted(added), dtype=np.int64).reshape(-1, 2)
+    removed = np.array(sorted(removed), dtype=np.int64).reshape(-1, 2)
+    ids = self.ids
+    return MidpointUpdate(cone_ids, ids[added], find_midpoints_of_edge_indices(self.cones, added), ids[removed])
+
+  def _insert(self, indices):
+    vertices = self._vertices
+    vertices.extend(map(tuple, self._points[len(vertices):self._no_cones].tolist()))
+    if not self._triangles:
+      self._pending.extend(indices)
+      indices = self._pending
+      if not self._start_triangulation():
+        return
+      self._pending = []
+    for index in indices:
+      if index not in self._started_with:
+        self._insert_vertex(index)
+    self._started_with = ()
+
+  def _start_triangulation(self):
+    # the first triangle needs three cones that are not on one line
+    vertices = self._vertices
+    pending = self._pending
+    first = pending[0]
+    second = next((i for i in pending if vertices[i] != vertices[first]), None)
+    if second is None:
+      return False
+    third = next((i for i in pending if _orient(vertices[first], vertices[second], vertices[i]) != 0), None)
+    if third is None:
+      return False
+    if _orient(vertices[first], vertices[second], vertices[third]) < 0:
+      second, third = third, second
+    self._add_triangle(first, second, third)
+    self._add_triangle(second, first, _GHOST)
+    self._add_triangle(third, second, _GHOST)
+    self._add_triangle(first, third, _GHOST)
+    self._started_with = (first, second, third)
+    return True
+
+  def _touch(self, edge, existed):
+    # remembers whether an edge was in the triangulation before the first change to it since _touched was reset
+    if edge[0] >= 0 and edge[1] >= 0:
+      self._touched.setdefault(edge if edge[0] < edge[1] else edge[::-1], existed)
+
+  def _add_triangle(self, a, b, c):
+    triangles = self._triangles
+    for edge in ((a, b), (b, c), (c, a)):
+      self._touch(edge, edge in triangles or edge[::-1] in triangles)
+    triangles[(a, b)] = c
+    triangles[(b, c)] = a
+    triangles[(c, a)] = b
+    self._hint = (a, b)
+
+  def _delete_triangle(self, a, b, c):
+    triangles = self._triangles
+    for edge in ((a, b), (b, c), (c, a)):
+      self._touch(edge, True)
+    del triangles[(a, b)], triangles[(b, c)], triangles[(c, a)]
+
+  def _in_conflict(self, a, b, c, point):
+    # whether point is inside the circumcircle of (a, b, c). For a ghost triangle that is the
+    # open half plane outside its hull edge, plus the inside of the hull edge itself
+    vertices = self._vertices
+    if _GHOST in (a, b, c):
+      if a == _GHOST:
+        a, b = b, c
+      elif b == _GHOST:
+        a, b = c, a
+      orientation = _orient(vertices[a], vertices[b], point)
+      if orientation != 0:
+        return orientation > 0
+      start, end = vertices[a], vertices[b]
+      along = (point[0] - start[0]) * (end[0] - start[0]) + (point[1] - start[1]) * (end[1] - start[1])
+      return 0 < along < (end[0] - start[0]) ** 2 + (end[1] - start[1]) ** 2
+    return _incircle(vertices[a], vertices[b], vertices[c], point) > 0
+
+  def _locate(self, point):
+    # walks from the last triangle made towards point, returns a triangle in conflict with it
+    # or None if point is a vertex already
+    vertices = self._vertices
+    triangles = self._triangles
+    a, b = self._hint if self._hint in triangles else next(iter(triangles))
+    c = triangles[(a, b)]
+    if _GHOST in (a, b, c):
+      a, b = next((edge for edge in ((a, b), (b, c), (c, a)) if _GHOST not in edge))
+      a, b = b, a
+      c = triangles[(a, b)]
+    for step in range(len(triangles) + 1):
+      # try the edges starting from a different one every step, so the walk can't go round in circles
+      for edge in ((a, b), (b, c), (c, a))[step % 3:] + ((a, b), (b, c), (c, a))[:step % 3]:
+        if _orient(vertices[edge[0]], vertices[edge[1]], point) < 0:
+          a, b = edge[1], edge[0]
+          c = triangles[(a, b)]
+          if c == _GHOST:
+            return a, b, c
+          break
+      else:
+        if point in (vertices[a], vertices[b], vertices[c]):
+          return None
+        return a, b, c
+    raise RuntimeError("point location did not finish, the triangulation is broken")
+
+  def _insert_vertex(self, index):
+    point = self._vertices[index]
+    triangle = self._locate(point)
+    if triangle is None:
+      return
+    self._delete_triangle(*triangle)
+    a, b, c = triangle
+    # remove every triangle in conflict next to the hole and fill the hole with a fan around the new vertex
+    edges = [(a, b), (b, c), (c, a)]
+    triangles = self._triangles
+    while edges:
+      v, w = edges.pop()
+      x = triangles.get((w, v))
+      if x is None:
+        continue
+      if self._in_conflict(w, v, x, point):
+        self._delete_triangle(w, v, x)
+        edges.append((v, x))
+        edges.append((x, w))
+      else:
+        self._add_triangle(index, v, w)
+
+
 def combine_yellow_and_blue_cones(yellow_cones, blue_cones):
   """Combines a list of yellow cones and a list of blue cones into one list where
   yellow and blue cones alternate
@@ -0,0 +1,158 @@
+import hashlib
+from collections import OrderedDict, namedtuple
+import numpy as np
+import delauney as dlny
+import instrumentation
+from trackgeometry import get_circles, get_arc_lengths
+
+# the speed independent geometry of a set of midpoints
+# circles: (centers, radii) from get_circles, arc_lengths and station from get_arc_lengths
+Geometry = namedtuple("Geometry", ["circles", "arc_lengths", "station"])
+
+def content_hash(*parts):
+    """Hashes arrays and plain values (numbers, strings, tuples of them) into a short hex key
+
+    Arrays are hashed with their dtype and shape, so the same bytes viewed differently give different keys.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            digest.update(f"{part.dtype.str}{part.shape}".encode())
+            digest.update(part.data)
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"|")
+    return digest.hexdigest()
+
+def _freeze(value):
+    # cached arrays are shared by every caller, so nobody may write to them
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, tuple):
+        for item in value:
+            _freeze(item)
+    return value
+
+class GeometryCache:
+    """Least recently used cache of results keyed by the content of their input arrays
+
+    Replanning on the same cone map many times a second only changes the speeds, so the
+    midpoints, circles and arc lengths are looked up by a hash of the cones or midpoints and
+    only computed when the arrays actually change. The cached arrays are read-only.
+    """
+    def __init__(self, max_entries=32):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key, compute):
+        """Returns the cached value of key, or computes, caches and returns it
+
+        Parameters
+        ----------
+        key: a hashable key, e.g ("geometry", content_hash(midpoints), closed)
+
+        compute: function with no arguments that computes the value on a miss
+        """
+        value = self._entries.get(key)
+        if value is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = _freeze(compute())
+        self._entries[key] = value
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return value
+
+    def stats(self):
+        """A dict with the numbers of hits, misses and evictions so far and the number of cached entries"""
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions, "entries": len(self._entries)}
+
+    def clear(self):
+        """Forgets every cached entry, the statistics are kept"""
+        self._entries.clear()
+
+# the active GeometryCache, None while caching is disabled
+cache = GeometryCache()
+
+def enable(max_entries=32):
+    """Starts caching with a new, empty cache
+
+    Parameters
+    ----------
+    max_entries: how many results the cache keeps before evicting the least recently used
+
+    Returns
+    -------
+    The new GeometryCache, for reading its stats
+    """
+    global cache
+    cache = GeometryCache(max_entries)
+    return cache
+
+def disable():
+    """Stops caching, everything is computed on every call"""
+    global cache
+    cache = None
+
+def _lookup(kind, array, closed, compute):
+    # the cached result of compute for the content of array, or just compute while caching is disabled
+    active = cache
+    if active is None:
+        return compute()
+    started = instrumentation.start()
+    hits = active.hits
+    value = active.lookup((kind, content_hash(array), bool(closed)), compute)
+    instrumentation.stop("geometry_cache", started, {"hits": active.hits - hits}, points=len(array))
+    return value
+
+def _compute_geometry(midpoints, closed):
+    started = instrumentation.start()
+    circles = get_circles(midpoints, closed)
+    instrumentation.stop("circles", started, midpoints=len(midpoints))
+    started = instrumentation.start()
+    arc_lengths, station = get_arc_lengths(midpoints, circles, closed)
+    instrumentation.stop("arc_lengths", started, midpoints=len(midpoints))
+    return Geometry(circles, arc_lengths, station)
+
+def get_geometry(midpoints, closed=False):
+    """The circles, arc lengths and station of the midpoints, from the cache when they are unchanged
+
+    Parameters
+    ----------
+    midpoints: array of (x,y) coordinates of the track midpoints
+
+    closed: if True the midpoints form a closed lap
+
+    Returns
+    -------
+    A Geometry (circles, arc_lengths, station), see get_circles and get_arc_lengths
+    """
+    midpoints = np.asarray(midpoints, dtype=float)
+    return _lookup("geometry", midpoints, closed, lambda: _compute_geometry(midpoints, closed))
+
+def get_track_midpoints(cones, closed=False):
+    """delauney.find_track_midpoints of the cones, from the cache when the cones are unchanged
+
+    Parameters
+    ----------
+    cones: array of alternating yellow and blue cone coordinates
+
+    closed: if True the cones go around a closed lap
+
+    Returns
+    -------
+    The ordered array of midpoints. It is shared with every other caller and read-only,
+    NewVelocityPlanner.get_midpoints returns a copy that can be changed
+    """
+    cones = np.asarray(cones, dtype=float)
+    return _lookup("track_midpoints", cones, closed, lambda: dlny.find_track_midpoints(cones, closed))
@@ -0,0 +1,78 @@
+import time
+from collections import deque
+
+# the active Recorder, None while instrumentation is disabled
+recorder = None
+
+class Recorder:
+    """Collects the timing records of the planning stages
+
+    Every record is a dict with the keys
+        - stage: the name of the stage (e.g "delaunay", "forward_sweep")
+        - seconds: the wall time the stage took
+        - counts: a dict of event counts (e.g max_accel evaluations), can be empty
+        - sizes: a dict of the array sizes the stage worked on (e.g number of cones)
+
+    The last capacity records are kept in records, and callback (if given) is called
+    with each record as it arrives.
+    """
+    def __init__(self, capacity=1024, callback=None):
+        self.records = deque(maxlen=capacity)
+        self.callback = callback
+
+    def record(self, record):
+        self.records.append(record)
+        if self.callback is not None:
+            self.callback(record)
+
+    def clear(self):
+        self.records.clear()
+
+    def totals(self):
+        """Sums the time and counts of the kept records per stage
+
+        Returns
+        -------
+        A dict mapping every stage name to a dict with the keys calls, seconds and counts
+        """
+        totals = {}
+        for record in self.records:
+            total = totals.setdefault(record["stage"], {"calls": 0, "seconds": 0.0, "counts": {}})
+            total["calls"] += 1
+            total["seconds"] += record["seconds"]
+            for name, count in record["counts"].items():
+                total["counts"][name] = total["counts"].get(name, 0) + count
+        return totals
+
+def enable(callback=None, capacity=1024):
+    """Starts recording the planning stages
+
+    Parameters
+    ----------
+    callback: function called with every record as soon as a stage finishes
+
+    capacity: how many of the latest records the ring buffer keeps
+
+    Returns
+    -------
+    The new Recorder, its records attribute holds the latest records
+    """
+    global recorder
+    recorder = Recorder(capacity, callback)
+    return recorder
+
+def disable():
+    """Stops recording, the stages go back to only checking that recorder is None"""
+    global recorder
+    recorder = None
+
+def start():
+    # start time of a stage, or None when instrumentation is disabled
+    return time.perf_counter() if recorder is not None else None
+
+def stop(stage, started, counts=None, **sizes):
+    # records a stage that began at started (from start), does nothing if instrumentation was disabled
+    active = recorder
+    if started is None or active is None:
+        return
+    active.record({"stage": stage, "seconds": time.perf_counter() - started, "counts": counts or {}, "sizes": sizes})
@@ -1,7 +1,5 @@
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.integrate import quad
-import random
+import bezierlength
 
 class BezierCurve:
     def __init__(self, P0, P1, P2, P3, numpoints, numcones):
@@ -9,59 +7,90 @@ class BezierCurve:
         self.P1 = np.array(P1)
         self.P2 = np.array(P2)
         self.P3 = np.array(P3)
+        self.control_points = np.array([P0, P1, P2, P3], dtype=float)
         self.points = np.array([self.P0])  
         self.left = np.empty((0, 2))       
         self.right = np.empty((0, 2))      
+        self.build_length_index()
         self.discretize(numpoints, numcones)
 
     def bezier_curve(self, t):
-        return (1 - t)**3 * self.P0 + 3 * (1 - t)**2 * t * self.P1 + 3 * (1 - t) * t**2 * self.P2 + t**3 * self.P3
+        return bezierlength.cubic_bezier_points(self.control_points, t)
 
     def bezier_derivative(self, t):
-        return 3 * (1 - t)**2 * (self.P1 - self.P0) + 6 * (1 - t) * t * (self.P2 - self.P1) + 3 * t**2 * (self.P3 - self.P2)
+        return bezierlength.cubic_bezier_derivatives(self.control_points, t)[0]
+
+    def evaluate(self, t):
+        """Points, first and second derivatives, unit normals and signed curvature at an array of t,
+        see bezierlength.evaluate_cubic_bezier"""
+        return bezierlength.evaluate_cubic_bezier(self.control_points, t)
 
     def arc_length(self, t):
         derivative = self.bezier_derivative(t)
         return np.linalg.norm(derivative)
 
+    def _speeds(self, t):
+        # arc_length for an array of t, |B'(t)| at every entry
+        derivative = self.bezier_derivative(t)
+        return np.sqrt(derivative[..., 0] * derivative[..., 0] + derivative[..., 1] * derivative[..., 1])
+
+    def build_length_index(self, intervals=64, order=8):
+        # cumulative arc length at intervals + 1 evenly spaced t, every interval integrated with
+        # order point Gauss-Legendre (exact to rounding for all but the sharpest cusps)
+        self._index_t = np.linspace(0, 1, intervals + 1)
+        self._nodes, self._weights = np.polynomial.legendre.leggauss(order)
+        step = 1 / intervals
+        node_t = self._index_t[:-1, None] + 0.5 * (self._nodes + 1) * step
+        pieces = self._speeds(node_t) @ self._weights * (step / 2)
+        self._index_length = np.concatenate(([0.0], np.cumsum(pieces)))
+
+    def length_at(self, t):
+        """Arc length from 0 to every entry of t, from the length index plus one Gauss-Legendre
+        integral over the part of the interval before t"""
+        t = np.clip(np.asarray(t, dtype=float), 0, 1)
+        intervals = len(self._index_t) - 1
+        start = np.minimum((t * intervals).astype(int), intervals - 1)
+        t_start = self._index_t[start]
+        node_t = t_start[..., None] + 0.5 * (self._nodes + 1) * (t - t_start)[..., None]
+        return self._index_length[start] + (self._speeds(node_t) @ self._weights) * (t - t_start) / 2
+
     def compute_total_length(self):
-        total_length, _ = quad(self.arc_length, 0, 1)
-        return total_length
+        return self._index_length[-1]
+
+    def find_t_for_lengths(self, target_lengths, newton_steps=2):
+        """Finds the t at which the curve has travelled every one of target_lengths
+
+        The t is interpolated from the length index, then refined with Newton steps
+        (the derivative of the length is the speed |B'(t)|).
+        """
+        target_lengths = np.asarray(target_lengths, dtype=float)
+        t = np.interp(target_lengths, self._index_length, self._index_t)
+        for _ in range(newton_steps):
+            speed = self._speeds(t)
+            error = self.length_at(t) - target_lengths
+            t = np.clip(t - np.divide(error, speed, out=np.zeros_like(error), where=speed > 0), 0, 1)
+        return t
 
     def find_t_for_length(self, target_length, total_length):
-        left, right = 0, 1
-        while right - left > 1e-6:
-            mid = (left + right) / 2.0
-            current_length, _ = quad(self.arc_length, 0, mid)
-            if current_length < target_length:
-                left = mid
-            else:
-                right = mid
-        return (left + right) / 2.0
+        return float(self.find_t_for_lengths(target_length))
 
     def get_norm_norm(self, t, direction, strength):
-        derivative = self.bezier_derivative(t)
-        norm_derivative = derivative / np.linalg.norm(derivative)
+        normal = self.evaluate(t).normals
         if(direction < 0):
-            return np.array([-norm_derivative[1], norm_derivative[0]])
-        return np.array([norm_derivative[1], -norm_derivative[0]])
+            return normal
+        return -normal
 
     def discretize(self, num_points, num_cones):
         total_length = self.compute_total_length()
+        # the t of every evenly spaced point and cone, all looked up at once
+        point_t = self.find_t_for_lengths(np.arange(1, num_points) / num_points * total_length)
+        cone_t = self.find_t_for_lengths(np.arange(1, num_cones) / num_cones * total_length)
 
-        for i in range(1, num_points):
-            target_length = (i / num_points) * total_length
-            t = self.find_t_for_length(target_length, total_length)
-            point = self.bezier_curve(t)
-
-            # Append points to arrays
-            self.points = np.vstack([self.points, point])
-        for i in range(1, num_cones):
-            target_length = (i / num_cones) * total_length
-            t = self.find_t_for_length(target_length, total_length)
-            point = self.bezier_curve(t)
-            self.left = np.vstack([self.left, self.get_norm_norm(t, 1, 1.5) + point])
-            self.right = np.vstack([self.right, self.get_norm_norm(t, -1, 1.5) + point])
+        self.points = np.concatenate((self.points, self.bezier_curve(point_t)))
+        # the cones sit one unit either side of the curve, "left" is on the side of get_norm_norm(t, 1)
+        cones = self.evaluate(cone_t)
+        self.left = np.concatenate((self.left, cones.points - cones.normals))
+        self.right = np.concatenate((self.right, cones.points + cones.normals))
 
     
     def index_wrapper(self, index, len_list):
@@ -147,10 +176,12 @@ class BezierCurve:
         return True
 
     def plot_points(self, in_order_points, in_order_points2, out_of_order_points, out_of_order_points2):
+        import matplotlib.pyplot as plt
+
         # Create a figure with 2 subplots
         fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(12, 6))
         t_values = np.linspace(0, 1, 1000)
-        curve_points = np.array([self.bezier_curve(t) for t in t_values])
+        curve_points = self.bezier_curve(t_values)
 
         # Plot out-of-order points and out-of-order points 2
         ax1.scatter(*zip(*out_of_order_points), color='blue', label='Out-of-order 1')
@@ -187,9 +218,11 @@ class BezierCurve:
         plt.show()
 
     def plot(self, num_curve_points=100):
+        import matplotlib.pyplot as plt
+
         # Plot the original Bézier curve
         t_values = np.linspace(0, 1, num_curve_points)
-        curve_points = np.array([self.bezier_curve(t) for t in t_values])
+        curve_points = self.bezier_curve(t_values)
 
         plt.plot(curve_points[:, 0], curve_points[:, 1], label="Bézier Curve", color='blue')
 
@@ -0,0 +1,143 @@
+from collections import namedtuple
+import numpy as np
+import instrumentation
+
+# path: (N, 2) array of the optimized points, one per midpoint
+# offsets: how far every point moved from its midpoint along the left normal (negative is to the right)
+# duals: the scaled ADMM dual variables, passed back in through warm_start with offsets
+# iterations: the number of ADMM iterations the solve took
+RacingLine = namedtuple("RacingLine", ["path", "offsets", "duals", "iterations"])
+
+def _left_normals(midpoints, closed):
+    # unit normals pointing to the left of the direction of travel, from central differences
+    if closed:
+        tangents = np.roll(midpoints, -1, axis=0) - np.roll(midpoints, 1, axis=0)
+    else:
+        tangents = np.gradient(midpoints, axis=0)
+    tangents /= np.hypot(tangents[:, 0], tangents[:, 1])[:, None]
+    return np.column_stack((-tangents[:, 1], tangents[:, 0]))
+
+def get_curvature_matrices(midpoints, normals, closed=False):
+    """Builds the least squares form of the curvature of the path midpoints + offsets * normals
+
+    The curvature at every point is approximated by the second difference of the path divided by
+    the square of the local spacing, so for offsets a the curvatures (x components then y components)
+    are A @ a + b. A has three non-zeros per row, so A.T @ A is banded (periodic for a closed lap).
+
+    Parameters
+    ----------
+    midpoints: (N, 2) array of the track midpoints
+
+    normals: (N, 2) array of the unit directions the points may move in
+
+    closed: if True the midpoints form a closed lap and every point has a curvature,
+    otherwise the first and last have none
+
+    Returns
+    -------
+    A tuple (A, b), A a sparse CSC matrix with N columns
+    """
+    # scipy.sparse is slow to import, so it is only loaded once a racing line is needed
+    import scipy.sparse as sparse
+    no_points = len(midpoints)
+    if closed:
+        segments = np.roll(midpoints, -1, axis=0) - midpoints
+        rows = np.arange(no_points)
+        previous, following = (rows - 1) % no_points, (rows + 1) % no_points
+    else:
+        segments = np.diff(midpoints, axis=0)
+        rows = np.arange(1, no_points - 1)
+        previous, following = rows - 1, rows + 1
+    lengths = np.hypot(segments[:, 0], segments[:, 1])
+    spacing = 0.5 * (lengths[previous] + lengths[rows])
+    weights = 1 / (spacing * spacing)
+
+    no_rows = len(rows)
+    difference = sparse.csr_matrix(
+        (np.concatenate((weights, -2 * weights, weights)), (np.tile(np.arange(no_rows), 3), np.concatenate((previous, rows, following)))),
+        shape=(no_rows, no_points))
+    A = sparse.vstack((difference @ sparse.diags(normals[:, 0]), difference @ sparse.diags(normals[:, 1]))).tocsc()
+    b = np.concatenate((difference @ midpoints[:, 0], difference @ midpoints[:, 1]))
+    return A, b
+
+def minimum_curvature(midpoints, left, right, closed=False, margin=0.5, warm_start=None, rho=0.03, tolerance=1e-4, max_iterations=20000):
+    """Finds the path through the track with the least total squared curvature
+
+    Every midpoint may move sideways (along its normal) as far as the track width allows, minus
+    a margin. The squared curvature is a quadratic in the sideways offsets with a banded matrix,
+    and the width limits are bounds on the offsets, so the problem is a box constrained QP. It is
+    solved with ADMM: the matrix is factorized once with a sparse LU (near-linear for a banded
+    matrix), then every iteration is one solve with that factorization and a clip to the bounds.
+    On an open track the first point stays where it is, that is where the car is.
+
+    Parameters
+    ----------
+    midpoints: (N, 2) array of the ordered track midpoints
+
+    left, right: the room to the left and right of every midpoint, looking along the order of the midpoints
+    (e.g from trackwidth.get_track_width, which checks which way round the midpoints go. The blue and
+    yellow distances of ClearanceField.query are only left and right when blue is on the left)
+
+    closed: if True the midpoints form a closed lap
+
+    margin: the distance the path keeps from both boundaries
+
+    warm_start: the RacingLine of an earlier solve on a track with the same number of midpoints,
+    its offsets and duals are the starting point of this one
+
+    rho: the ADMM penalty, relative to the mean of the diagonal of the QP matrix
+
+    tolerance: the solve stops once the offsets change less than this (in metres) in an iteration
+    and stay within this of the bounds
+
+    max_iterations: the most ADMM iterations. A solve that has not met tolerance by then raises
+    RuntimeError, like the closed lap sweeps that do not settle, since its offsets can still be
+    outside the bounds
+
+    Returns
+    -------
+    A RacingLine (path, offsets, duals, iterations). path can be passed straight to
+    VelocityPlanner.calculate_profile in place of the midpoints.
+    """
+    import scipy.sparse as sparse
+    from scipy.sparse.linalg import splu
+    started = instrumentation.start()
+    midpoints = np.asarray(midpoints, dtype=float)
+    no_points = len(midpoints)
+    normals = _left_normals(midpoints, closed)
+    A, b = get_curvature_matrices(midpoints, normals, closed)
+
+    lower = margin - np.broadcast_to(np.asarray(right, dtype=float), (no_points,))
+    upper = np.broadcast_to(np.asarray(left, dtype=float), (no_points,)) - margin
+    # where the track is narrower than both margins the path goes through the middle of what is left
+    too_narrow = lower > upper
+    lower = np.where(too_narrow, 0.5 * (lower + upper), lower)
+    upper = np.where(too_narrow, lower, upper)
+    if not closed:
+        lower[0] = upper[0] = 0.0
+
+    H = (A.T @ A).tocsc()
+    q = A.T @ b
+    penalty = rho * H.diagonal().mean()
+    factorization = splu((H + penalty * sparse.identity(no_points, format="csc")).tocsc())
+
+    if warm_start is not None and len(warm_start.offsets) == no_points:
+        offsets, duals = np.clip(warm_start.offsets, lower, upper), warm_start.duals.copy()
+    else:
+        offsets, duals = np.clip(np.zeros(no_points), lower, upper), np.zeros(no_points)
+
+    iterations = 0
+    while iterations < max_iterations:
+        iterations += 1
+        unconstrained = factorization.solve(penalty * (offsets - duals) - q)
+        previous = offsets
+        offsets = np.clip(unconstrained + duals, lower, upper)
+        duals += unconstrained - offsets
+        if np.abs(unconstrained - offsets).max() < tolerance and np.abs(offsets - previous).max() < tolerance:
+            break
+    else:
+        raise RuntimeError(f"the racing line did not converge to {tolerance} within {max_iterations} iterations")
+
+    path = midpoints + offsets[:, None] * normals
+    instrumentation.stop("minimum_curvature", started, {"iterations": iterations}, points=no_points)
+    return RacingLine(path, offsets, duals, iterations)
@@ -0,0 +1,186 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+import NewVelocityPlanner as nvp
+from trackgeometry import get_circles, get_arc_lengths
+
+# vehicle parameters a sweep can vary, with the values hard-coded in NewVelocityPlanner
+# A_MAX there is (max torque * gear ratio) / (mass * 0.5 * wheel diameter)
+DEFAULT_PARAMETERS = {
+    "m_veh": nvp.m_veh,
+    "mu": nvp.mu,
+    "C_L": nvp.C_L,
+    "C_D": nvp.C_D,
+    "A": nvp.A,
+    "torque": 21,
+    "gear_ratio": 13.25,
+    "wheel_diameter": 0.202,
+}
+
+def get_parameter_table(parameters):
+    """Turns a table of vehicle parameter sets into one array per parameter
+
+    Parameters
+    ----------
+    parameters: a dict of equal length arrays, a NumPy structured array or anything else
+    that can be indexed by column name (e.g a pandas DataFrame). Every row is one vehicle.
+    Columns can be any of DEFAULT_PARAMETERS plus v_max, which is required.
+    Missing columns use the NewVelocityPlanner values.
+
+    Returns
+    -------
+    A dict mapping every parameter name to a float array with one entry per parameter set
+    """
+    if isinstance(parameters, np.ndarray):
+        names = parameters.dtype.names or ()
+    else:
+        names = list(parameters.keys())
+    unknown = set(names) - set(DEFAULT_PARAMETERS) - {"v_max"}
+    if unknown:
+        raise ValueError(f"unknown vehicle parameters: {sorted(unknown)}")
+    if "v_max" not in names:
+        raise ValueError("the parameter table needs a v_max column")
+
+    table = {name: np.atleast_1d(np.asarray(parameters[name], dtype=float)) for name in names}
+    no_sets = len(table["v_max"])
+    for name, value in DEFAULT_PARAMETERS.items():
+        table.setdefault(name, np.full(no_sets, float(value)))
+    if any(len(column) != no_sets for column in table.values()):
+        raise ValueError("all parameter columns must have the same length")
+    return table
+
+def _vehicle_constants(table):
+    # the keyword arguments of the vehicle_* functions in NewVelocityPlanner
+    return {
+        "m_veh": table["m_veh"],
+        "mu": table["mu"],
+        "C_L": table["C_L"],
+        "C_D": table["C_D"],
+        "A": table["A"],
+        "a_max": table["torque"] * table["gear_ratio"] / (table["m_veh"] * 0.5 * table["wheel_diameter"]),
+    }
+
+def _forward_sweep(vx, radii, arc_lengths, vehicle):
+    for i in range(len(vx) - 1):
+        np.minimum(vx[i + 1], nvp.vehicle_reachable_speed(False, vx[i], radii[i], None, arc_lengths[i], **vehicle), out=vx[i + 1])
+
+def _backward_sweep(vx, radii, arc_lengths, vehicle):
+    for j in range(len(vx) - 1, 0, -1):
+        np.minimum(vx[j - 1], nvp.vehicle_reachable_speed(True, vx[j], radii[j], radii[j - 1], arc_lengths[j - 1], **vehicle), out=vx[j - 1])
+
+def _periodic_sweep(backwards, vx, radii, arc_lengths, vehicle, max_laps):
+    # sweeps the lap and then takes the step across the seam, if that arrives slower than the lap started
+    # the lap is swept again from the slower speed, until no parameter set changes any more. A profile
+    # that has not settled after max_laps can break the limits across the seam, so that raises
+    limits = vx.copy()
+    first, last = (-1, 0) if backwards else (0, -1)
+    for _ in range(max_laps):
+        vx[:] = limits
+        if backwards:
+            _backward_sweep(vx, radii, arc_lengths, vehicle)
+            seam = nvp.vehicle_reachable_speed(True, vx[0], radii[0], radii[-1], arc_lengths[-1], **vehicle)
+        else:
+            _forward_sweep(vx, radii, arc_lengths, vehicle)
+            seam = nvp.vehicle_reachable_speed(False, vx[-1], radii[-1], None, arc_lengths[-1], **vehicle)
+        slower = seam < limits[first]
+        if not slower.any():
+            break
+        limits[first] = np.where(slower, seam, limits[first])
+    else:
+        raise RuntimeError(f"the closed lap speeds of {int(slower.sum())} parameter sets did not settle within {max_laps} laps")
+    return vx
+
+def evaluate_parameters(radii, arc_lengths, parameters, v_current=0.0, closed=False, max_laps=5):
+    """Computes the speed profile and lap time of many vehicles on one track at once
+
+    The forward and backward sweeps of VelocityPlanner.calculate_profile run over all
+    parameter sets together, one waypoint at a time, so the cost is the track length times
+    a few array operations over the parameter sets. The profile is the feasible speed
+    envelope, before VelocityPlanner smooths it.
+
+    Parameters
+    ----------
+    radii: the radius at every waypoint (from get_circles)
+
+    arc_lengths: the arc length of every segment (from get_arc_lengths)
+
+    parameters: the vehicle parameter table, see get_parameter_table
+
+    v_current: the speed at the first waypoint (open tracks only)
+
+    closed: if True the waypoints form a closed lap and the profile is the periodic steady state
+
+    max_laps: the most laps a closed lap sweep goes around before settling, RuntimeError if it has not by then
+
+    Returns
+    -------
+    A tuple (lap_times, profiles). lap_times has one time per parameter set (from the first
+    to the last waypoint on an open track) and profiles has shape (parameter sets, waypoints).
+    """
+    table = get_parameter_table(parameters)
+    vehicle = _vehicle_constants(table)
+    radii = np.asarray(radii, dtype=float)
+    arc_lengths = np.asarray(arc_lengths, dtype=float)
+
+    # one row per waypoint and one column per parameter set, so every step of the sweep is a contiguous row
+    v_limit = np.minimum(nvp.vehicle_cornering_speed(radii[:, None], vehicle["m_veh"], vehicle["mu"], vehicle["C_L"], vehicle["A"]), table["v_max"])
+    if closed:
+        vx = np.roll(v_limit, 1, axis=0)
+        _periodic_sweep(False, vx, radii, arc_lengths, vehicle, max_laps)
+        _periodic_sweep(True, vx, radii, arc_lengths, vehicle, max_laps)
+        segment_speeds = vx + np.roll(vx, -1, axis=0)
+    else:
+        vx = np.empty_like(v_limit)
+        vx[0] = v_current
+        vx[1:] = v_limit[:-1]
+        _forward_sweep(vx, radii, arc_lengths, vehicle)
+        _backward_sweep(vx, radii, arc_lengths, vehicle)
+        segment_speeds = vx[:-1] + vx[1:]
+
+    # constant acceleration over a segment, so the average speed is the mean of both ends
+    with np.errstate(divide='ignore'):
+        lap_times = np.sum(2 * arc_lengths[:, None] / segment_speeds, axis=0)
+    return lap_times, np.ascontiguousarray(vx.T)
+
+def sweep_parameters(midpoints, parameters, v_current=0.0, closed=False, workers=None, chunk_size=1024):
+    """Evaluates thousands of vehicle setups on one track
+
+    The track geometry is computed once, then the parameter table is split into chunks of
+    chunk_size sets that are evaluated with evaluate_parameters on a process pool.
+
+    Parameters
+    ----------
+    midpoints: array of (x,y) coordinates of the track midpoints
+
+    parameters: the vehicle parameter table, see get_parameter_table
+
+    v_current: the speed at the first midpoint (open tracks only)
+
+    closed: if True the midpoints form a closed lap
+
+    workers: the number of worker processes, None uses every CPU and 1 runs in this process
+
+    chunk_size: the number of parameter sets each worker evaluates at once
+
+    Returns
+    -------
+    A tuple (lap_times, profiles) as returned by evaluate_parameters, for the whole table
+    """
+    circles = get_circles(midpoints, closed)
+    arc_lengths, _ = get_arc_lengths(midpoints, circles, closed)
+    radii = circles[1]
+
+    table = get_parameter_table(parameters)
+    no_sets = len(table["v_max"])
+    # an empty table still makes one (empty) chunk, so the result has the usual (0,) and (0, N) shapes
+    chunks = [{name: column[i:i + chunk_size] for name, column in table.items()} for i in range(0, max(no_sets, 1), chunk_size)]
+
+    if workers == 1 or len(chunks) == 1:
+        results = [evaluate_parameters(radii, arc_lengths, chunk, v_current, closed) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(evaluate_parameters, repeat(radii), repeat(arc_lengths), chunks, repeat(v_current), repeat(closed)))
+
+    lap_times = np.concatenate([result[0] for result in results])
+    profiles = np.concatenate([result[1] for result in results])
+    return lap_times, profiles
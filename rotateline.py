@@ -26,7 +26,8 @@ def rotate_line(m, b, x0, y0, theta):
     
     return new_m, new_b
 
-m, b = 1, 2  
-x0, y0 = 3, 5
-theta = -30
-print(rotate_line(m, b, x0, y0, theta))
\ No newline at end of file
+if __name__ == "__main__":
+    m, b = 1, 2  
+    x0, y0 = 3, 5
+    theta = -30
+    print(rotate_line(m, b, x0, y0, theta))
@@ -0,0 +1,54 @@
+import numpy as np
+import benchmark
+
+def test_generate_track_is_reproducible():
+    first = benchmark.generate_track(400, seed=5)
+    second = benchmark.generate_track(400, seed=5)
+    for a, b in zip(first, second):
+        np.testing.assert_array_equal(a, b)
+    assert not np.array_equal(first[0], benchmark.generate_track(400, seed=6)[0])
+
+def test_generate_track_faces_the_cone_pairs():
+    yellow, blue = benchmark.generate_track(1000, seed=1, track_width=3.0, noise=0.0)
+    assert yellow.shape == blue.shape == (500, 2)
+    np.testing.assert_allclose(np.hypot(*(blue - yellow).T), 3.0)
+    # walking along the midpoints the blue cones are on the left
+    midpoints = 0.5 * (yellow + blue)
+    tangents = np.roll(midpoints, -1, axis=0) - midpoints
+    offsets = blue - midpoints
+    assert np.all(tangents[:, 0] * offsets[:, 1] - tangents[:, 1] * offsets[:, 0] > 0)
+
+def test_run_benchmark_reports_every_stage():
+    results = benchmark.run_benchmark(sizes=[100, 200], repeat=1)
+    assert [(result["cones"], result["stage"]) for result in results] == \
+        [(size, stage) for size in (100, 200) for stage in benchmark.STAGES]
+    for result in results:
+        assert result["seconds"] >= 0 and result["peak_memory_bytes"] > 0
+        assert result["points"] > 0
+        assert result["source"] == ("cones" if result["stage"] in benchmark.MIDPOINT_STAGES else "global_midpoints")
+
+def test_slow_stages_are_skipped_on_bigger_tracks():
+    results = benchmark.run_benchmark(sizes=[100, 200], stages=["midpoints", "calculate_profile"], repeat=1, max_seconds=0.0)
+    assert [(result["cones"], result["stage"], result["source"]) for result in results] == [
+        (100, "midpoints", "cones"), (100, "calculate_profile", "midpoints")]
+
+def test_unskipped_stages_fall_back_to_the_cone_pairs():
+    results = benchmark.run_benchmark(sizes=[100], stages=["circles"], repeat=1)
+    assert [(result["stage"], result["source"], result["points"]) for result in results] == [("circles", "pairs", 50)]
+
+def test_compare_results_flags_regressions():
+    baseline = [
+        {"cones": 100, "stage": "circles", "source": "pairs", "seconds": 0.1, "peak_memory_bytes": 1000},
+        {"cones": 100, "stage": "arc_lengths", "source": "pairs", "seconds": 0.1, "peak_memory_bytes": 1000},
+        {"cones": 100, "stage": "smoothing", "source": "pairs", "seconds": 1e-5, "peak_memory_bytes": 1000},
+    ]
+    results = [
+        {"cones": 100, "stage": "circles", "source": "pairs", "seconds": 0.2, "peak_memory_bytes": 1000},
+        {"cones": 100, "stage": "arc_lengths", "source": "pairs", "seconds": 0.11, "peak_memory_bytes": 2000},
+        # much slower, but by less than the timer noise
+        {"cones": 100, "stage": "smoothing", "source": "pairs", "seconds": 1e-4, "peak_memory_bytes": 1000},
+        # not in the baseline
+        {"cones": 1000, "stage": "circles", "source": "pairs", "seconds": 9.0, "peak_memory_bytes": 1000},
+    ]
+    assert benchmark.compare_results(results, baseline) == [
+        (100, "circles", "seconds", 0.1, 0.2), (100, "arc_lengths", "peak_memory_bytes", 1000, 2000)]
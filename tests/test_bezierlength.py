@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+import bezierlength
+
+GENTLE = np.array([[-12, -36], [-12, -52], [-26, -36], [-36, -60]], dtype=float)
+# the control polygon crosses itself and the curve has a cusp in the middle, its length is 20 * sqrt(2) - 10
+SHARP = np.array([[0, 0], [10, 10], [0, 10], [10, 0]], dtype=float)
+LENGTHS = np.array([36.8322986998203, 20 * np.sqrt(2) - 10])
+
+def polyline_length(P, t1, t2, no_points=200001):
+    points = bezierlength.cubic_bezier_points(P, np.linspace(t1, t2, no_points))
+    return np.sum(np.hypot(*np.diff(points, axis=0).T))
+
+@pytest.mark.parametrize("tolerance", [1e-3, 1e-6, 1e-9])
+def test_adaptive_lengths_are_within_tolerance(tolerance):
+    result = bezierlength.adaptive_bezier_arclengths(np.stack((GENTLE, SHARP)), tolerance=tolerance)
+    assert np.all(np.abs(result.lengths - LENGTHS) <= max(tolerance, 1e-10))
+    assert np.all(result.errors <= tolerance)
+
+def test_reversed_bounds_give_a_negative_length():
+    P = GENTLE[None]
+    forward = bezierlength.adaptive_bezier_arclengths(P, 0.5, 0.7)
+    backward = bezierlength.adaptive_bezier_arclengths(P, 0.7, 0.5)
+    np.testing.assert_allclose(backward.lengths, -forward.lengths, rtol=1e-12)
+    np.testing.assert_allclose(backward.lengths, bezierlength.bezier_arclengths(P, 0.7, 0.5), rtol=1e-12)
+    assert backward.evaluations[0] == forward.evaluations[0]
+
+def test_zero_tolerance_stops_at_rounding():
+    result = bezierlength.adaptive_bezier_arclengths(np.stack((GENTLE, SHARP)), tolerance=0)
+    assert np.all(result.evaluations < 10000)
+    np.testing.assert_allclose(result.lengths, LENGTHS, rtol=1e-11)
+
+def test_real_arc_len_ends_at_t2():
+    P0, P1, P2, P3 = GENTLE
+    # 0.2 is not a whole number of 1/100 steps in floating point, the polyline must still stop at 0.7
+    length = bezierlength.bezier_real_arc_len(P0, P1, P2, P3, 0.5, 0.7)
+    np.testing.assert_allclose(length, polyline_length(GENTLE, 0.5, 0.7), rtol=1e-4)
+    assert length <= bezierlength.bezier_arclength(P0, P1, P2, P3, 0.5, 0.7)
+
+def random_segments(seed, no_segments=500):
+    return np.random.default_rng(seed).uniform(-50, 50, (no_segments, 4, 2))
+
+def test_batched_lengths_match_bezier_arclength():
+    control_points = random_segments(0)
+    expected = [bezierlength.bezier_arclength(*P) for P in control_points]
+    np.testing.assert_allclose(bezierlength.bezier_arclengths(control_points), expected, rtol=1e-14)
+
+def test_batched_lengths_with_per_segment_bounds():
+    control_points = random_segments(1)
+    rng = np.random.default_rng(1)
+    t1, t2 = rng.uniform(0, 1, (2, len(control_points)))
+    expected = [bezierlength.bezier_arclength(*P, t1=a, t2=b) for P, a, b in zip(control_points, t1, t2)]
+    np.testing.assert_allclose(bezierlength.bezier_arclengths(control_points, t1, t2), expected, rtol=1e-14, atol=1e-14)
+    # one bound for all of them
+    expected = [bezierlength.bezier_arclength(*P, t1=0.25) for P in control_points]
+    np.testing.assert_allclose(bezierlength.bezier_arclengths(control_points, 0.25), expected, rtol=1e-14)
+
+def test_other_orders_converge():
+    np.testing.assert_allclose(bezierlength.bezier_arclengths(GENTLE[None], order=64), LENGTHS[:1], rtol=1e-12)
+    nodes, weights = bezierlength.get_gauss_legendre(7)
+    assert len(nodes) == len(weights) == 7 and bezierlength.get_gauss_legendre(7)[0] is nodes
+    np.testing.assert_allclose(weights.sum(), 2.0)
+
+def test_no_segments():
+    assert bezierlength.bezier_arclengths(np.empty((0, 4, 2))).shape == (0,)
+
+def scalar_evaluation(P, t):
+    # the per-t formulas evaluate_cubic_bezier replaced
+    P0, P1, P2, P3 = P
+    point = (1 - t)**3 * P0 + 3 * (1 - t)**2 * t * P1 + 3 * (1 - t) * t**2 * P2 + t**3 * P3
+    first = 3 * (1 - t)**2 * (P1 - P0) + 6 * (1 - t) * t * (P2 - P1) + 3 * t**2 * (P3 - P2)
+    second = 6 * (1 - t) * (P2 - 2 * P1 + P0) + 6 * t * (P3 - 2 * P2 + P1)
+    normal = np.array([-first[1], first[0]]) / np.linalg.norm(first)
+    curvature = (first[0] * second[1] - first[1] * second[0]) / max((first[0]**2 + first[1]**2)**1.5, 1e-6)
+    return point, first, second, normal, curvature
+
+def test_evaluation_matches_scalar_formulas():
+    t = np.linspace(0, 1, 101)
+    result = bezierlength.evaluate_cubic_bezier(GENTLE, t)
+    expected = [scalar_evaluation(GENTLE, s) for s in t]
+    for field, (name, values) in enumerate(result._asdict().items()):
+        np.testing.assert_allclose(values, [e[field] for e in expected], rtol=1e-13, atol=1e-13, err_msg=name)
+
+def test_evaluation_keeps_the_shape_of_t():
+    t = np.random.default_rng(0).uniform(0, 1, (3, 5))
+    result = bezierlength.evaluate_cubic_bezier(GENTLE, t)
+    assert result.points.shape == result.normals.shape == (3, 5, 2) and result.curvature.shape == (3, 5)
+    np.testing.assert_allclose(np.hypot(*np.moveaxis(result.normals, -1, 0)), 1.0)
+    np.testing.assert_allclose(np.sum(result.normals * result.first, axis=-1), 0.0, atol=1e-12)
+    scalar = bezierlength.evaluate_cubic_bezier(GENTLE, 0.3)
+    assert scalar.points.shape == (2,) and scalar.curvature.shape == ()
+
+def test_curvature_sign_and_cusp():
+    # the usual bezier approximation of a unit quarter circle turning left, and the same arc driven the other way
+    arc = np.array([[1, 0], [1, 0.5523], [0.5523, 1], [0, 1]], dtype=float)
+    assert np.all(bezierlength.evaluate_cubic_bezier(arc, np.linspace(0, 1, 11)).curvature > 0)
+    assert np.all(bezierlength.evaluate_cubic_bezier(arc[::-1], np.linspace(0, 1, 11)).curvature < 0)
+    np.testing.assert_allclose(bezierlength.evaluate_cubic_bezier(arc, 0.5).curvature, 1.0, rtol=0.01)
+    # SHARP stops at t = 0.5, the normal is undefined there
+    cusp = bezierlength.evaluate_cubic_bezier(SHARP, 0.5)
+    assert np.all(np.isnan(cusp.normals)) and np.isfinite(cusp.curvature)
+
+def test_motion_profile_helpers_match_scalar_formulas():
+    import cubicBezierMotionProfile as profile
+    P = [np.array(point) for point in GENTLE]
+    for t in (0.0, 0.2, 0.5, 0.9, 1.0):
+        point, first, second, _, curvature = scalar_evaluation(GENTLE, t)
+        np.testing.assert_allclose(profile.cubic_bezier(t, P), point, rtol=1e-14)
+        np.testing.assert_allclose(profile.cubic_bezier_first_derivative(t, P), first, rtol=1e-14, atol=1e-13)
+        np.testing.assert_allclose(profile.cubic_bezier_second_derivative(t, P), second, rtol=1e-14, atol=1e-13)
+        np.testing.assert_allclose(profile.curvature(t, P), abs(curvature), rtol=1e-13)
+    np.testing.assert_allclose(profile.curvature(np.array([0.2, 0.5]), P), [profile.curvature(0.2, P), profile.curvature(0.5, P)])
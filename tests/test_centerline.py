@@ -0,0 +1,105 @@
+import gc
+import numpy as np
+import pytest
+import centerline
+import delauney as dlny
+from tracks import circle_cones, stadium_cones
+
+def blue_side(result, cones):
+    # cross product of the direction of travel with the vector to the blue cone of every edge
+    direction = np.gradient(result.midpoints, axis=0)
+    across = cones[result.edges[:, 1]] - result.midpoints
+    return direction[:, 0] * across[:, 1] - direction[:, 1] * across[:, 0]
+
+def as_cycle(points, start):
+    # rolls a closed lap so it begins at start
+    return np.roll(points, -int(np.argmin(np.hypot(*(points - start).T))), axis=0)
+
+def noisy(cones, seed=0):
+    # moves every cone a little, so no four cones lie on one circle and the triangulation is unique
+    return cones + np.random.default_rng(seed).normal(0, 0.01, cones.shape)
+
+@pytest.mark.parametrize("cones, blue_outside", [(stadium_cones(), False), (circle_cones(), True)], ids=["stadium", "circle"])
+def test_closed_lap_matches_track_midpoints(cones, blue_outside):
+    result = centerline.find_centerline(cones)
+    midpoints = dlny.find_track_midpoints(cones, closed=True)
+    assert result.closed
+    assert len(result.midpoints) == len(midpoints)
+    # find_track_midpoints follows the cone order, the centerline keeps the blue cones on the left
+    if blue_outside:
+        midpoints = midpoints[::-1]
+    np.testing.assert_allclose(as_cycle(result.midpoints, midpoints[0]), midpoints, atol=1e-12)
+    assert np.all(blue_side(result, cones) > 0)
+
+def test_edges_read_yellow_to_blue():
+    cones = stadium_cones()
+    result = centerline.find_centerline(cones)
+    colors = dlny.get_alternating_colors(len(cones))
+    assert np.all(colors[result.edges[:, 0]] == dlny.YELLOW) and np.all(colors[result.edges[:, 1]] == dlny.BLUE)
+    np.testing.assert_array_equal(result.midpoints, cones[result.edges].mean(axis=1))
+
+def test_clockwise_lap_is_driven_the_other_way():
+    cones = stadium_cones()
+    # the same cones, with yellow on the outside, go round clockwise
+    swapped = cones.reshape(-1, 2, 2)[:, ::-1].reshape(-1, 2)
+    result = centerline.find_centerline(swapped)
+    assert result.closed and np.all(blue_side(result, swapped) > 0)
+    forward = centerline.find_centerline(cones).midpoints
+    np.testing.assert_allclose(as_cycle(result.midpoints[::-1], forward[0]), forward, atol=1e-12)
+
+def test_partial_track_is_open():
+    cones = stadium_cones()[:60]
+    result = centerline.find_centerline(cones)
+    assert not result.closed
+    assert np.all(blue_side(result, cones) > 0)
+    expected = {tuple(point) for point in dlny.find_track_midpoints(cones).tolist()}
+    assert {tuple(point) for point in result.midpoints.tolist()} <= expected
+    assert len(result.midpoints) >= len(cones) - 4
+
+def test_gaps_are_bridged_up_to_max_gap():
+    cones = stadium_cones()[:60]
+    # take out three cone pairs, about 6 m of track
+    gapped = np.concatenate((cones[:24], cones[30:]))
+    # edges across the gap are longer than max_width, so the walk stops either side of it
+    joined = centerline.find_centerline(gapped, max_gap=10.0, max_width=6.0)
+    assert not joined.closed
+    assert np.all(np.hypot(*np.diff(joined.midpoints, axis=0).T) <= 10.0)
+    assert np.all(blue_side(joined, gapped) > 0)
+    split = centerline.find_centerline(gapped, max_gap=3.0, max_width=6.0)
+    assert len(split.midpoints) < len(joined.midpoints)
+
+def test_colours_need_not_alternate():
+    cones = noisy(stadium_cones())
+    colors = dlny.get_alternating_colors(len(cones))
+    order = np.random.default_rng(0).permutation(len(cones))
+    result = centerline.find_centerline(cones[order], colors[order])
+    expected = centerline.find_centerline(cones).midpoints
+    assert result.closed
+    np.testing.assert_allclose(as_cycle(result.midpoints, expected[0]), expected, atol=1e-12)
+
+def test_cached_per_triangulation():
+    cones = stadium_cones()
+    triangulation = dlny.get_triangulation_from_cones(cones)
+    first = centerline.get_centerline(triangulation)
+    assert centerline.get_centerline(triangulation) is first
+    assert centerline.get_centerline(triangulation, max_gap=5.0) is not first
+    assert triangulation in centerline._cache
+    del triangulation
+    gc.collect()
+    assert len(centerline._cache) == 0
+
+def test_cache_follows_the_cone_coordinates():
+    cones = stadium_cones()
+    triangulation = dlny.get_triangulation_from_cones(cones)
+    first = centerline.get_centerline(triangulation, cones)
+    moved = cones + [1.0, 0.0]
+    # the same triangles over cones that moved, the midpoints move with them
+    second = centerline.get_centerline(triangulation, moved)
+    np.testing.assert_allclose(second.midpoints, first.midpoints + [1.0, 0.0])
+    assert centerline.get_centerline(triangulation, cones.copy()) is first
+
+def test_cached_arrays_are_read_only():
+    result = centerline.find_centerline(stadium_cones())
+    for values in (result.midpoints, result.edges):
+        with pytest.raises(ValueError):
+            values[0] = 0
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+import geometrycache
+import NewVelocityPlanner as nvp
+import parametersweep
+import VelocityPlanner as vp
+from trackgeometry import get_circles, get_arc_lengths
+from tracks import stadium_cones
+
+LAPS = 6
+
+@pytest.fixture(scope="module")
+def lap():
+    midpoints = nvp.get_midpoints(stadium_cones(), None, closed=True)
+    circles = get_circles(midpoints, closed=True)
+    return midpoints, circles, get_arc_lengths(midpoints, circles, closed=True)[0]
+
+def closed_envelope(planner, radii, arc_lengths, max_laps=5):
+    # the sweeps of calculate_profile(closed=True), before smoothing
+    vx = np.roll(np.minimum(planner.cornering_speed_limit(radii), planner.v_max), 1)
+    planner.periodic_acceleration_helper(False, vx, radii, arc_lengths, max_laps)
+    planner.periodic_acceleration_helper(True, vx, radii, arc_lengths, max_laps)
+    return vx
+
+def test_closed_lap_matches_unrolled_laps(lap):
+    # the middle lap of several laps planned as one open track is the periodic steady state
+    midpoints, (_, radii), arc_lengths = lap
+    planner = nvp.VelocityPlanner(30)
+    no_points = len(midpoints)
+    unrolled_radii, unrolled_lengths = np.tile(radii, LAPS), np.tile(arc_lengths, LAPS)
+    vx = np.roll(np.minimum(planner.cornering_speed_limit(unrolled_radii), planner.v_max), 1)
+    vx[0] = 0.0
+    planner.profile_with_acceleration_helper(False, vx, unrolled_radii, unrolled_lengths)
+    planner.profile_with_acceleration_helper(True, vx, unrolled_radii, unrolled_lengths)
+    middle = vx[(LAPS // 2) * no_points:(LAPS // 2 + 1) * no_points]
+    np.testing.assert_array_equal(closed_envelope(planner, radii, arc_lengths), middle)
+
+def test_closed_profile_is_periodic(lap):
+    midpoints, _, _ = lap
+    planner = nvp.VelocityPlanner(30)
+    profile = planner.calculate_profile(midpoints, 0.0, closed=True)
+    assert len(profile) == len(midpoints)
+    # planning the lap from any other start line gives the same speeds, just rotated
+    shifted = planner.calculate_profile(np.roll(midpoints, -17, axis=0), 0.0, closed=True)
+    np.testing.assert_allclose(shifted, np.roll(profile, -17), rtol=1e-12)
+
+def test_simple_model_matches_unrolled_laps(lap):
+    midpoints, _, _ = lap
+    no_points = len(midpoints)
+    unrolled = np.concatenate([midpoints] * LAPS + [midpoints[:1]])
+    open_speeds = vp.getVelocitiesNew(unrolled, get_circles(unrolled), 2, 2, 8)
+    closed_speeds = vp.getVelocitiesNew(midpoints, get_circles(midpoints, closed=True), 2, 2, 8, closed=True)
+    middle = open_speeds[(LAPS // 2) * no_points:(LAPS // 2 + 1) * no_points]
+    np.testing.assert_allclose(closed_speeds, middle, rtol=1e-12)
+
+def test_unsettled_lap_raises(lap):
+    # the sweep engine starts every lap at the first waypoint. The stadium starts halfway down a straight,
+    # where the first pass assumes top speed but the car only gets to a lower speed out of the hairpin,
+    # so the lap needs a second pass
+    _, (_, radii), arc_lengths = lap
+    parameters = {"v_max": np.array([30.0])}
+    parametersweep.evaluate_parameters(radii, arc_lengths, parameters, closed=True)
+    with pytest.raises(RuntimeError):
+        parametersweep.evaluate_parameters(radii, arc_lengths, parameters, closed=True, max_laps=1)
+    with pytest.raises(RuntimeError):
+        closed_envelope(nvp.VelocityPlanner(30), radii, arc_lengths, max_laps=0)
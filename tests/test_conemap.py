@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+import delauney as dlny
+from conemap import CONE_DTYPE, ConeMap
+
+@pytest.fixture
+def cone_map():
+    rng = np.random.default_rng(0)
+    return ConeMap.from_yellow_and_blue(rng.uniform(0, 100, (300, 2)), rng.uniform(0, 100, (200, 2)))
+
+def check_sorted(cone_map):
+    records = cone_map.records
+    assert np.all(np.diff(records["color"]) >= 0)
+    for color in (dlny.YELLOW, dlny.BLUE):
+        assert np.all(np.diff(records["x"][records["color"] == color]) >= 0)
+    assert len(np.unique(records["id"])) == len(records)
+
+def by_id(records):
+    return records[np.argsort(records["id"])]
+
+def test_yellow_and_blue_of_different_lengths(cone_map):
+    assert len(cone_map) == 500
+    check_sorted(cone_map)
+    assert np.all(cone_map.colors[cone_map.ids < 300] == dlny.YELLOW)
+    assert np.all(cone_map.colors[cone_map.ids >= 300] == dlny.BLUE)
+    assert cone_map.cones.shape == (500, 2)
+    assert np.shares_memory(cone_map.cones, cone_map.records)
+
+def test_by_color_is_a_view(cone_map):
+    records = cone_map.records
+    for color, count in ((dlny.YELLOW, 300), (dlny.BLUE, 200)):
+        group = cone_map.by_color(color)
+        assert len(group) == count and np.all(group["color"] == color)
+        assert np.shares_memory(group, records)
+
+@pytest.mark.parametrize("x_min, x_max", [(20.0, 40.0), (-5.0, 3.0), (99.0, 200.0), (60.0, 50.0)])
+def test_region_matches_brute_force(cone_map, x_min, x_max):
+    records = cone_map.records
+    for color in (dlny.YELLOW, dlny.BLUE):
+        region = cone_map.region(color, x_min, x_max)
+        expected = records[(records["color"] == color) & (records["x"] >= x_min) & (records["x"] <= x_max)]
+        np.testing.assert_array_equal(region, expected)
+
+@pytest.mark.parametrize("color", [None, dlny.YELLOW, dlny.BLUE])
+def test_in_box_matches_brute_force(cone_map, color):
+    records = cone_map.records
+    box = cone_map.in_box(10.0, 30.0, 60.0, 70.0, color)
+    inside = (records["x"] >= 10) & (records["x"] <= 60) & (records["y"] >= 30) & (records["y"] <= 70)
+    if color is not None:
+        inside &= records["color"] == color
+    np.testing.assert_array_equal(box, records[inside])
+
+def test_append_merges_into_place(cone_map):
+    before = cone_map.records.copy()
+    rng = np.random.default_rng(1)
+    ids = cone_map.append(rng.uniform(0, 100, (50, 2)), rng.integers(0, 2, 50), confidence=0.5)
+    np.testing.assert_array_equal(ids, np.arange(500, 550))
+    assert len(cone_map) == 550
+    check_sorted(cone_map)
+    added = np.isin(cone_map.ids, ids)
+    assert np.all(cone_map.records["confidence"][added] == np.float32(0.5))
+    np.testing.assert_array_equal(by_id(cone_map.records[~added]), by_id(before))
+    # ids given by the caller are kept, and the next free id goes past them
+    cone_map.append([[1.0, 2.0]], dlny.BLUE, ids=[1000])
+    assert cone_map.append([[3.0, 4.0]], dlny.YELLOW)[0] == 1001
+
+def test_delete_by_id(cone_map):
+    assert cone_map.delete([0, 1, 450, 9999]) == 3
+    assert len(cone_map) == 497
+    assert not np.isin([0, 1, 450], cone_map.ids).any()
+    check_sorted(cone_map)
+    assert cone_map.delete([0]) == 0
+
+def test_save_and_load_memory_maps(cone_map, tmp_path):
+    path = tmp_path / "cones.npy"
+    cone_map.save(path)
+    loaded = ConeMap.load(path)
+    assert isinstance(loaded.records, np.memmap)
+    np.testing.assert_array_equal(loaded.records, cone_map.records)
+    np.testing.assert_array_equal(loaded.region(dlny.BLUE, 20, 40), cone_map.region(dlny.BLUE, 20, 40))
+
+    # changing the loaded map does not change the file
+    loaded.append([[5.0, 5.0]], dlny.YELLOW)
+    assert loaded.ids.max() == 500
+    loaded.delete([0])
+    np.testing.assert_array_equal(ConeMap.load(path, mmap_mode=None).records, cone_map.records)
+
+def test_load_rejects_other_arrays(tmp_path):
+    path = tmp_path / "points.npy"
+    np.save(path, np.zeros((4, 2)))
+    with pytest.raises(ValueError):
+        ConeMap.load(path)
+
+def test_records_need_not_be_given_sorted():
+    records = np.array([(3.0, 0.0, dlny.BLUE, 1.0, 7), (1.0, 0.0, dlny.BLUE, 1.0, 2), (2.0, 1.0, dlny.YELLOW, 1.0, 5)], dtype=CONE_DTYPE)
+    cone_map = ConeMap(records)
+    np.testing.assert_array_equal(cone_map.ids, [5, 2, 7])
+    assert cone_map.append([[0.0, 0.0]], dlny.YELLOW)[0] == 8
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import delauney as dlny
+from tracks import circle_cones, stadium_cones
+
+def random_cones(seed, no_cones=200):
+    return np.random.default_rng(seed).uniform(0, 100, (no_cones, 2))
+
+def as_set(edges):
+    # coordinate pair edges as an order independent set
+    return {frozenset((tuple(a), tuple(b))) for a, b in edges}
+
+@pytest.mark.parametrize("seed", range(3))
+def test_edges_from_simplices_are_unique_and_sorted(seed):
+    simplices = dlny.get_triangulation_from_cones(random_cones(seed)).simplices
+    edges = dlny.get_edges_from_simplices(simplices)
+    assert edges.dtype == np.int64 and edges.shape[1] == 2
+    assert np.all(edges[:, 0] < edges[:, 1])
+    expected = {tuple(sorted(pair)) for simplex in simplices.tolist() for pair in
+                ((simplex[0], simplex[1]), (simplex[0], simplex[2]), (simplex[1], simplex[2]))}
+    # every edge once, sorted by the first and then the second index
+    assert sorted(expected) == [tuple(edge) for edge in edges.tolist()]
+
+def test_no_simplices_have_no_edges():
+    assert dlny.get_edges_from_simplices(np.empty((0, 3), dtype=np.int32)).shape == (0, 2)
+
+@pytest.mark.parametrize("cones", [circle_cones(), stadium_cones(), random_cones(0), random_cones(1, 101)],
+                         ids=["circle", "stadium", "random", "random_odd"])
+def test_index_pipeline_matches_coordinate_pipeline(cones):
+    triangulation = dlny.get_triangulation_from_cones(cones)
+    triangles = dlny.get_triangles_from_triangulation(triangulation, cones)
+    internal_edges = dlny.find_internal_edges(dlny.generate_edges_from_triangles(triangles), cones)
+    midpoints = dlny.find_midpoints_of_internal_edges(internal_edges)
+
+    index_midpoints, edges = dlny.find_internal_midpoints(cones)
+    assert as_set(dlny.get_edge_coordinates(cones, edges)) == as_set(internal_edges)
+    # the coordinate pipeline lists every shared edge twice, once per triangle
+    assert {tuple(point) for point in index_midpoints.tolist()} == {tuple(point) for point in np.asarray(midpoints).tolist()}
+
+def test_internal_edges_connect_different_colours():
+    cones = random_cones(4)
+    colors = np.random.default_rng(4).integers(0, 2, len(cones)).astype(np.int8)
+    _, edges = dlny.find_internal_midpoints(cones, colors)
+    assert np.all(colors[edges[:, 0]] != colors[edges[:, 1]])
+    all_edges = dlny.get_edges_from_simplices(dlny.get_triangulation_from_cones(cones).simplices)
+    same = all_edges[colors[all_edges[:, 0]] == colors[all_edges[:, 1]]]
+    assert len(edges) + len(same) == len(all_edges)
+
+def test_alternating_colors():
+    np.testing.assert_array_equal(dlny.get_alternating_colors(5), [dlny.YELLOW, dlny.BLUE, dlny.YELLOW, dlny.BLUE, dlny.YELLOW])
+    cones = circle_cones()
+    np.testing.assert_array_equal(dlny.find_internal_midpoints(cones)[0],
+                                  dlny.find_internal_midpoints(cones, dlny.get_alternating_colors(len(cones)))[0])
+
+def test_midpoints_of_edge_indices():
+    cones = np.array([[0.0, 0.0], [2.0, 0.0], [2.0, 4.0]])
+    np.testing.assert_array_equal(dlny.find_midpoints_of_edge_indices(cones, np.array([[0, 1], [1, 2], [0, 2]])),
+                                  [[1.0, 0.0], [2.0, 2.0], [1.0, 2.0]])
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+import delauney as dlny
+import geometrycache
+import NewVelocityPlanner as nvp
+from tracks import circle_cones
+
+@pytest.fixture
+def cache():
+    active = geometrycache.cache
+    yield geometrycache.enable(max_entries=2)
+    geometrycache.cache = active
+
+def test_hits_misses_and_evictions(cache):
+    first, second, third = circle_cones(20), circle_cones(30), circle_cones(40)
+    geometrycache.get_track_midpoints(first, closed=True)
+    geometrycache.get_track_midpoints(first.copy(), closed=True)
+    assert cache.stats() == {"hits": 1, "misses": 1, "evictions": 0, "entries": 1}
+    # the same cones as an open track are a different entry
+    geometrycache.get_track_midpoints(first, closed=False)
+    geometrycache.get_track_midpoints(second, closed=True)
+    assert cache.stats() == {"hits": 1, "misses": 3, "evictions": 1, "entries": 2}
+    geometrycache.get_track_midpoints(second, closed=True)
+    geometrycache.get_track_midpoints(third, closed=True)
+    geometrycache.get_track_midpoints(first, closed=True)
+    assert cache.stats() == {"hits": 2, "misses": 5, "evictions": 3, "entries": 2}
+
+def test_changed_cones_are_recomputed(cache):
+    cones = circle_cones()
+    before = geometrycache.get_track_midpoints(cones, closed=True)
+    cones[3] += 0.5
+    after = geometrycache.get_track_midpoints(cones, closed=True)
+    assert cache.misses == 2
+    np.testing.assert_array_equal(after, dlny.find_track_midpoints(cones, closed=True))
+    assert not np.array_equal(before, after)
+
+def test_cached_results_match_uncached(cache):
+    cones = circle_cones()
+    midpoints = nvp.get_midpoints(cones, None, closed=True)
+    cached = nvp.VelocityPlanner(15).calculate_profile(midpoints, 0.0, closed=True)
+    geometrycache.disable()
+    np.testing.assert_array_equal(nvp.get_midpoints(cones, None, closed=True), midpoints)
+    np.testing.assert_array_equal(nvp.VelocityPlanner(15).calculate_profile(midpoints, 0.0, closed=True), cached)
+
+def test_get_midpoints_returns_its_own_copy(cache):
+    cones = circle_cones()
+    midpoints = nvp.get_midpoints(cones, None, closed=True)
+    expected = midpoints.copy()
+    midpoints[0] = -1000.0
+    np.testing.assert_array_equal(nvp.get_midpoints(cones, None, closed=True), expected)
+    assert not geometrycache.get_track_midpoints(cones, closed=True).flags.writeable
@@ -0,0 +1,67 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the modules the planners and the onboard code import, none of them may compute, plot or print when imported
+LIBRARY_MODULES = [
+    "bezierlength",
+    "cubicBezierMotionProfile",
+    "lineProjection",
+    "delauney",
+    "trackgeometry",
+    "NewVelocityPlanner",
+    "VelocityPlanner",
+    "curvature",
+    "rotateline",
+    "instrumentation",
+    "geometrycache",
+    "centerline",
+    "conemap",
+    "trackfile",
+    "trackwidth",
+    "mincurvature",
+    "parametersweep",
+]
+
+# only loaded by the functions that need them
+HEAVY_MODULES = ["matplotlib", "scipy.interpolate", "scipy.integrate", "scipy.spatial", "scipy.sparse"]
+
+# seconds an import may take on top of numpy, which every module needs anyway
+IMPORT_BUDGET = 0.25
+
+# the report is the last line of stdout, everything the module printed comes before it
+SCRIPT = """
+import json, sys, time
+import numpy
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print()
+print(json.dumps({{"elapsed": elapsed, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+def import_in_new_process(module):
+    # a fresh interpreter for every module, so nothing is already imported. Returns what the
+    # import printed to stdout and stderr and the report
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    output, _, report = result.stdout.rstrip("\n").rpartition("\n")
+    return output, result.stderr, json.loads(report)
+
+@pytest.mark.parametrize("module", LIBRARY_MODULES)
+def test_import_has_no_side_effects(module):
+    output, errors, report = import_in_new_process(module)
+    assert output == ""
+    assert errors == ""
+    assert report["loaded"] == []
+
+@pytest.mark.parametrize("module", LIBRARY_MODULES)
+def test_import_time_budget(module):
+    # best of three, so one slow start on a busy machine does not fail the test
+    elapsed = min(import_in_new_process(module)[2]["elapsed"] for _ in range(3))
+    assert elapsed < IMPORT_BUDGET, f"importing {module} took {elapsed:.3f}s, the budget is {IMPORT_BUDGET}s"
@@ -0,0 +1,133 @@
+import time
+import numpy as np
+import pytest
+from scipy.spatial import Delaunay
+import delauney as dlny
+
+def random_cones(seed, no_cones=60):
+    rng = np.random.default_rng(seed)
+    return rng.uniform(0, 50, (no_cones, 2)), rng.integers(0, 2, no_cones).astype(np.int8)
+
+def edge_set(edges):
+    return set(map(tuple, np.asarray(edges).tolist()))
+
+def rebuilt_internal_edges(triangulator):
+    # the internal edges of a SciPy triangulation of the cones in the map, as cone id pairs
+    _, edges = dlny.find_internal_midpoints(triangulator.cones, triangulator.colors)
+    return edge_set(triangulator.ids[edges])
+
+def apply(known, update):
+    return (known | edge_set(update.added_edges)) - edge_set(update.removed_edges)
+
+@pytest.mark.parametrize("batch", [1, 2, 3, 5, 8])
+@pytest.mark.parametrize("seed", range(5))
+def test_updates_match_rebuild_after_every_batch(batch, seed):
+    cones, colors = random_cones(seed)
+    triangulator = dlny.IncrementalTriangulator()
+    known = set()
+    for start in range(0, len(cones), batch):
+        update = triangulator.add_cones(cones[start:start + batch], colors[start:start + batch])
+        known = apply(known, update)
+        current = edge_set(triangulator.get_internal_midpoints()[0])
+        assert known == current
+        if len(triangulator.cones) >= 3:
+            assert current == rebuilt_internal_edges(triangulator)
+
+@pytest.mark.parametrize("seed", range(5))
+def test_triangles_match_scipy(seed):
+    cones, colors = random_cones(seed)
+    triangulator = dlny.IncrementalTriangulator()
+    triangulator.add_cones(cones, colors)
+    triangles = np.searchsorted(triangulator.ids, triangulator.get_triangles())
+    expected = {tuple(sorted(simplex)) for simplex in Delaunay(cones).simplices.tolist()}
+    assert {tuple(sorted(triangle)) for triangle in triangles.tolist()} == expected
+
+@pytest.mark.parametrize("batch", [1, 3, 7])
+def test_drop_cones_behind(batch):
+    cones, colors = random_cones(7, no_cones=80)
+    order = np.argsort(cones[:, 0])
+    cones, colors = cones[order], colors[order]
+    triangulator = dlny.IncrementalTriangulator()
+    known = set()
+    for start in range(0, len(cones), batch):
+        known = apply(known, triangulator.add_cones(cones[start:start + batch], colors[start:start + batch]))
+        if start % 10 == 0 and start > 20:
+            update = triangulator.drop_cones_behind((cones[start, 0] - 15, 0), (1, 0))
+            assert np.all(np.isin(update.cone_ids, triangulator.ids, invert=True))
+            known = apply(known, update)
+        assert known == edge_set(triangulator.get_internal_midpoints()[0])
+        if len(triangulator.cones) >= 3:
+            assert known == rebuilt_internal_edges(triangulator)
+
+def test_first_triangle_reports_edges_between_pending_cones():
+    triangulator = dlny.IncrementalTriangulator()
+    assert len(triangulator.add_cones([[0, 0], [1, 0]], [dlny.YELLOW, dlny.BLUE]).added_edges) == 0
+    update = triangulator.add_cones([[0, 1]], [dlny.BLUE])
+    assert edge_set(update.added_edges) == {(0, 1), (0, 2)}
+
+def delaunay_violations(triangulator):
+    # the triangles with another cone strictly inside their circumcircle
+    cones = triangulator.cones
+    triangles = np.searchsorted(triangulator.ids, triangulator.get_triangles())
+    violations = 0
+    for a, b, c in triangles.tolist():
+        inside = [dlny._incircle(tuple(cones[a]), tuple(cones[b]), tuple(cones[c]), tuple(point)) > 0 for point in cones.tolist()]
+        violations += sum(inside)
+    return violations
+
+@pytest.mark.parametrize("seed", range(3))
+def test_drop_matches_scipy(seed):
+    cones, colors = random_cones(seed, no_cones=200)
+    triangulator = dlny.IncrementalTriangulator()
+    known = apply(set(), triangulator.add_cones(cones, colors))
+    # a different seed from the cones, the same stream would add cones on top of the first ones
+    rng = np.random.default_rng(seed + 100)
+    for _ in range(5):
+        known = apply(known, triangulator.drop_cones(rng.choice(triangulator.ids, 15, replace=False)))
+        triangles = np.searchsorted(triangulator.ids, triangulator.get_triangles())
+        expected = {tuple(sorted(simplex)) for simplex in Delaunay(triangulator.cones).simplices.tolist()}
+        assert {tuple(sorted(triangle)) for triangle in triangles.tolist()} == expected
+        assert known == edge_set(triangulator.get_internal_midpoints()[0])
+        # the rebuilt triangulation keeps taking new cones
+        known = apply(known, triangulator.add_cones(rng.uniform(0, 50, (5, 2)), rng.integers(0, 2, 5)))
+        assert known == rebuilt_internal_edges(triangulator)
+
+def test_drop_on_a_grid_with_repeated_cones():
+    # every square of the grid has four cones on one circle, and the first rows are detected twice
+    grid = np.array([(x, y) for x in range(12) for y in range(12)], dtype=float)
+    cones = np.concatenate((grid, grid[:30]))
+    triangulator = dlny.IncrementalTriangulator()
+    known = apply(set(), triangulator.add_cones(cones, np.arange(len(cones)) % 2))
+    known = apply(known, triangulator.drop_cones(triangulator.ids[::7]))
+    assert known == edge_set(triangulator.get_internal_midpoints()[0])
+    assert delaunay_violations(triangulator) == 0
+    # the repeated cones that are left are not triangulated, the rest are
+    used = np.unique(triangulator.get_triangles())
+    assert len(np.unique(triangulator.cones[np.searchsorted(triangulator.ids, used)], axis=0)) == len(used)
+    assert len(used) == len(np.unique(triangulator.cones, axis=0))
+
+def test_drop_down_to_a_line():
+    triangulator = dlny.IncrementalTriangulator()
+    triangulator.add_cones([[0, 0], [1, 1], [2, 2], [0, 2]], [dlny.YELLOW, dlny.BLUE, dlny.YELLOW, dlny.BLUE])
+    update = triangulator.drop_cones([3])
+    assert len(update.added_edges) == 0 and len(triangulator.get_triangles()) == 0
+    # the cones left are on one line, so there are no triangles and every internal edge is gone
+    assert edge_set(update.removed_edges) == {(0, 1), (1, 2), (0, 3), (2, 3)}
+    update = triangulator.add_cones([[2, 0]], dlny.BLUE)
+    assert edge_set(update.added_edges) == edge_set(triangulator.get_internal_midpoints()[0])
+
+def test_drop_costs_about_one_scipy_triangulation():
+    cones, colors = random_cones(0, no_cones=2000)
+    cones *= 6
+    triangulator = dlny.IncrementalTriangulator()
+    triangulator.add_cones(cones, colors)
+    drop, scipy = [], []
+    for _ in range(3):
+        started = time.perf_counter()
+        triangulator.drop_cones(triangulator.ids[:3])
+        drop.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        Delaunay(triangulator.cones)
+        scipy.append(time.perf_counter() - started)
+    # rebuilding with Bowyer-Watson in Python took about 30 times as long as SciPy
+    assert min(drop) < 10 * min(scipy)
@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+import delauney as dlny
+import geometrycache
+import instrumentation
+import NewVelocityPlanner as nvp
+from tracks import circle_cones, stadium_centerline
+
+@pytest.fixture
+def recorder():
+    recorder = instrumentation.enable()
+    yield recorder
+    instrumentation.disable()
+
+@pytest.fixture(autouse=True)
+def no_cache():
+    # cache hits would skip the stages that are being counted
+    cache = geometrycache.cache
+    geometrycache.disable()
+    yield
+    geometrycache.cache = cache
+
+def test_disabled_records_nothing():
+    instrumentation.disable()
+    assert instrumentation.start() is None
+    instrumentation.stop("stage", None, {"count": 1}, size=3)
+    assert instrumentation.recorder is None
+
+def test_record_holds_the_stage_counts_and_sizes(recorder):
+    started = instrumentation.start()
+    instrumentation.stop("stage", started, {"events": 4}, points=10)
+    [record] = recorder.records
+    assert record["stage"] == "stage" and record["seconds"] >= 0
+    assert record["counts"] == {"events": 4} and record["sizes"] == {"points": 10}
+
+def test_ring_buffer_keeps_the_latest_records():
+    received = []
+    recorder = instrumentation.enable(received.append, capacity=3)
+    try:
+        for i in range(5):
+            instrumentation.stop(f"stage{i}", instrumentation.start(), {"i": i})
+    finally:
+        instrumentation.disable()
+    assert [record["stage"] for record in recorder.records] == ["stage2", "stage3", "stage4"]
+    assert [record["stage"] for record in received] == [f"stage{i}" for i in range(5)]
+
+def test_totals_sum_per_stage(recorder):
+    for count in (1, 2, 3):
+        instrumentation.stop("a", instrumentation.start(), {"events": count})
+    instrumentation.stop("b", instrumentation.start())
+    totals = recorder.totals()
+    assert totals["a"]["calls"] == 3 and totals["a"]["counts"] == {"events": 6}
+    assert totals["b"] == {"calls": 1, "seconds": totals["b"]["seconds"], "counts": {}}
+    recorder.clear()
+    assert recorder.totals() == {}
+
+def test_delaunay_stages_are_recorded(recorder):
+    cones = circle_cones()
+    dlny.find_track_midpoints(cones, closed=True)
+    stages = {record["stage"]: record for record in recorder.records}
+    assert {"delaunay", "track_midpoints"} <= set(stages)
+    assert stages["delaunay"]["sizes"]["cones"] == len(cones)
+    assert stages["track_midpoints"]["sizes"]["midpoints"] == len(cones)
+
+    recorder.clear()
+    nvp.get_midpoints(cones, 12)
+    stages = [record["stage"] for record in recorder.records]
+    assert stages.count("delaunay") == 4
+    assert {"triangles", "edges", "internal_edges", "edge_midpoints"} <= set(stages)
+    assert stages[-1] == "get_midpoints"
+
+def test_windowed_midpoints_count_the_failed_windows(recorder):
+    # the last window holds two cones and has no triangles
+    nvp.get_midpoints(circle_cones()[:14], 6)
+    [record] = [record for record in recorder.records if record["stage"] == "get_midpoints"]
+    assert record["counts"] == {"windows": 3, "failed_windows": 1}
+
+@pytest.mark.parametrize("closed", [False, True])
+def test_profile_stages_are_recorded_without_changing_the_profile(recorder, closed):
+    midpoints = stadium_centerline()
+    planner = nvp.VelocityPlanner(25)
+    profile = planner.calculate_profile(midpoints, 0, closed)
+    instrumentation.disable()
+    np.testing.assert_array_equal(profile, planner.calculate_profile(midpoints, 0, closed))
+
+    stages = [record["stage"] for record in recorder.records]
+    sweeps = ["periodic_forward_sweep", "periodic_backward_sweep"] if closed else ["forward_sweep", "backward_sweep"]
+    assert set(sweeps) <= set(stages)
+    assert {"circles", "arc_lengths", "cornering_limit", "smoothing"} <= set(stages)
+    assert stages[-1] == "calculate_profile"
+    totals = recorder.totals()
+    if closed:
+        assert totals["periodic_forward_sweep"]["counts"]["laps"] >= 1
+    else:
+        assert totals["forward_sweep"]["counts"]["max_accel_evaluations"] > 0
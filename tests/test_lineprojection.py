@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+from scipy.integrate import quad
+from lineProjection import BezierCurve
+
+CONTROL_POINTS = [[-2.5, -4.14], [-3.8, 24.4], [33.6, 23.3], [33.8, -3.6]]
+
+@pytest.fixture
+def curve():
+    return BezierCurve(*CONTROL_POINTS, 200, 100)
+
+def quad_length(curve, t):
+    # the adaptive quadrature compute_total_length used before the length index
+    return quad(lambda s: np.linalg.norm(curve.bezier_derivative(s)), 0, t, epsabs=1e-13, epsrel=1e-13)[0]
+
+def test_length_index_matches_quad(curve):
+    np.testing.assert_allclose(curve.compute_total_length(), quad_length(curve, 1), rtol=1e-12)
+    t = np.random.default_rng(0).uniform(0, 1, 50)
+    np.testing.assert_allclose(curve.length_at(t), [quad_length(curve, s) for s in t], rtol=1e-12, atol=1e-12)
+    np.testing.assert_array_equal(curve.length_at([0.0, 1.0]), [0.0, curve.compute_total_length()])
+
+def test_find_t_for_lengths_inverts_length_at(curve):
+    total = curve.compute_total_length()
+    targets = np.linspace(0, total, 1000)
+    t = curve.find_t_for_lengths(targets)
+    assert np.all(np.diff(t) > 0)
+    np.testing.assert_allclose(curve.length_at(t), targets, atol=1e-10)
+    assert t[0] == 0 and t[-1] == 1
+
+def test_find_t_for_length_matches_bisection(curve):
+    total = curve.compute_total_length()
+    for target in (0.1 * total, 0.5 * total, 0.93 * total):
+        # the bisection on quad the lookup replaced, it stopped at a bracket of 1e-6
+        left, right = 0, 1
+        while right - left > 1e-6:
+            mid = (left + right) / 2
+            if quad_length(curve, mid) < target:
+                left = mid
+            else:
+                right = mid
+        t = curve.find_t_for_length(target, total)
+        assert isinstance(t, float)
+        assert abs(t - (left + right) / 2) < 1e-6
+
+def test_lengths_outside_the_curve_are_clipped(curve):
+    np.testing.assert_array_equal(curve.find_t_for_lengths([-5.0, curve.compute_total_length() + 5]), [0.0, 1.0])
+
+def test_discretize_spaces_points_evenly(curve):
+    assert curve.points.shape == (200, 2) and curve.left.shape == curve.right.shape == (99, 2)
+    np.testing.assert_array_equal(curve.points[0], CONTROL_POINTS[0])
+    # every point is a whole number of 1/200 of the length along the curve
+    t = curve.find_t_for_lengths(np.arange(200) / 200 * curve.compute_total_length())
+    np.testing.assert_allclose(curve.points, curve.bezier_curve(t), atol=1e-12)
+    np.testing.assert_allclose(np.diff(curve.length_at(t)), curve.compute_total_length() / 200, rtol=1e-9)
+
+def test_cones_sit_one_unit_either_side(curve):
+    t = curve.find_t_for_lengths(np.arange(1, 100) / 100 * curve.compute_total_length())
+    points = curve.bezier_curve(t)
+    np.testing.assert_allclose(np.hypot(*(curve.left - points).T), 1.0)
+    np.testing.assert_allclose(np.hypot(*(curve.right - points).T), 1.0)
+    # left is on the side of get_norm_norm(t, 1), right on the side of get_norm_norm(t, -1)
+    np.testing.assert_allclose(curve.left, points + curve.get_norm_norm(t, 1, 1.5), atol=1e-12)
+    np.testing.assert_allclose(curve.right, points + curve.get_norm_norm(t, -1, 1.5), atol=1e-12)
+
+def test_norm_norm_matches_scalar(curve):
+    for t in (0.1, 0.5, 0.8):
+        derivative = curve.bezier_derivative(t)
+        unit = derivative / np.linalg.norm(derivative)
+        np.testing.assert_allclose(curve.get_norm_norm(t, -1, 1.5), [-unit[1], unit[0]], rtol=1e-14)
+        np.testing.assert_allclose(curve.get_norm_norm(t, 1, 1.5), [unit[1], -unit[0]], rtol=1e-14)
@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+import delauney as dlny
+import NewVelocityPlanner as nvp
+import VelocityPlanner as vp
+from tracks import circle_cones
+
+@pytest.mark.parametrize("planner", [nvp, vp])
+def test_step_is_required(planner):
+    with pytest.raises(TypeError):
+        planner.get_midpoints(circle_cones())
+
+@pytest.mark.parametrize("planner", [nvp, vp])
+def test_single_triangulation(planner):
+    cones = circle_cones()
+    midpoints = planner.get_midpoints(cones, None, closed=True)
+    np.testing.assert_array_equal(midpoints, dlny.find_track_midpoints(cones, closed=True))
+    # every internal edge once, one midpoint between every yellow and blue cone pair and its neighbours
+    assert len(midpoints) == len(dlny.find_internal_midpoints(cones)[0])
+
+@pytest.mark.parametrize("planner", [nvp, vp])
+def test_failed_windows_are_skipped(planner):
+    # the first window is three cones on one line, the last window is a single cone
+    line = np.array([[0.0, 0.0], [1.0, 0.0], [2.0, 0.0]])
+    cones = np.concatenate((line, circle_cones()[:36], [[50.0, 50.0]]))
+    midpoints = planner.get_midpoints(cones, 3)
+    expected = []
+    for i in range(3, 39, 3):
+        window = cones[i:i + 3]
+        triangles = dlny.get_triangles_from_triangulation(dlny.get_triangulation_from_cones(window), window)
+        internal_edges = dlny.find_internal_edges(dlny.generate_edges_from_triangles(triangles), cones)
+        expected += dlny.find_midpoints_of_internal_edges(internal_edges)
+    assert len(expected) > 0
+    assert midpoints == expected
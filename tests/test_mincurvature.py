@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from scipy.optimize import lsq_linear
+import delauney as dlny
+import mincurvature
+import trackwidth
+from tracks import stadium_cones
+
+@pytest.fixture(scope="module")
+def stadium():
+    cones = stadium_cones(width=4.0, spacing=3.0)
+    return cones, dlny.find_track_midpoints(cones, closed=True)
+
+def objective(A, b, offsets):
+    residual = A @ offsets + b
+    return residual @ residual
+
+def test_matches_bounded_least_squares(stadium):
+    cones, midpoints = stadium
+    clearance = trackwidth.get_track_width(midpoints, cones)
+    line = mincurvature.minimum_curvature(midpoints, clearance.left, clearance.right, closed=True, tolerance=1e-7)
+    A, b = mincurvature.get_curvature_matrices(midpoints, mincurvature._left_normals(midpoints, True), closed=True)
+    expected = lsq_linear(A.toarray(), -b, bounds=(0.5 - clearance.right, clearance.left - 0.5), tol=1e-12).x
+    np.testing.assert_allclose(objective(A, b, line.offsets), objective(A, b, expected), rtol=1e-6)
+    assert objective(A, b, line.offsets) < 0.8 * objective(A, b, np.zeros(len(midpoints)))
+
+@pytest.mark.parametrize("reverse", [False, True])
+def test_path_stays_on_the_track_both_ways_round(stadium, reverse):
+    cones, midpoints = stadium
+    # start from a line 1 m left of the middle, so the room on either side is 1 and 3 m and swapping them matters
+    midpoints = midpoints + mincurvature._left_normals(midpoints, True)
+    if reverse:
+        midpoints = midpoints[::-1].copy()
+    clearance = trackwidth.get_track_width(midpoints, cones)
+    line = mincurvature.minimum_curvature(midpoints, clearance.left, clearance.right, closed=True, margin=0.5)
+    # every point of the path keeps the margin from both boundaries
+    field = trackwidth.ClearanceField(cones)
+    moved = field.query(line.path)
+    assert np.all(np.minimum(moved.left, moved.right) > 0.5 - 1e-3)
+    assert np.abs(line.offsets).max() > 1.0
+
+def test_track_width_follows_the_direction_of_travel(stadium):
+    cones, midpoints = stadium
+    forward = trackwidth.get_track_width(midpoints, cones)
+    backward = trackwidth.get_track_width(midpoints[::-1], cones)
+    np.testing.assert_array_equal(backward.left, forward.right[::-1])
+    np.testing.assert_array_equal(backward.right, forward.left[::-1])
+    field = trackwidth.ClearanceField(cones)
+    assert field.blue_on_left(midpoints) and not field.blue_on_left(midpoints[::-1])
+
+def test_warm_start(stadium):
+    cones, midpoints = stadium
+    clearance = trackwidth.get_track_width(midpoints, cones)
+    cold = mincurvature.minimum_curvature(midpoints, clearance.left, clearance.right, closed=True)
+    warm = mincurvature.minimum_curvature(midpoints, clearance.left, clearance.right, closed=True, warm_start=cold)
+    assert warm.iterations < cold.iterations
+    np.testing.assert_allclose(warm.offsets, cold.offsets, atol=1e-3)
+
+def test_open_track_keeps_the_first_point(stadium):
+    cones, midpoints = stadium
+    clearance = trackwidth.get_track_width(midpoints[:40], cones)
+    line = mincurvature.minimum_curvature(midpoints[:40], clearance.left, clearance.right)
+    assert line.offsets[0] == 0.0
+    np.testing.assert_array_equal(line.path[0], midpoints[0])
+
+def test_raises_when_not_converged(stadium):
+    cones, midpoints = stadium
+    clearance = trackwidth.get_track_width(midpoints, cones)
+    with pytest.raises(RuntimeError):
+        mincurvature.minimum_curvature(midpoints, clearance.left, clearance.right, closed=True, max_iterations=3)
+    # a warm start from the solution converges within the same few iterations
+    line = mincurvature.minimum_curvature(midpoints, clearance.left, clearance.right, closed=True)
+    warm = mincurvature.minimum_curvature(midpoints, clearance.left, clearance.right, closed=True, warm_start=line, max_iterations=3)
+    assert warm.iterations <= 3
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import NewVelocityPlanner as nvp
+import parametersweep
+from trackgeometry import get_circles, get_arc_lengths
+from tracks import stadium_centerline
+
+@pytest.fixture(scope="module")
+def track():
+    midpoints = stadium_centerline(spacing=1.0)
+    circles = get_circles(midpoints)
+    return midpoints, circles[1], get_arc_lengths(midpoints, circles)[0]
+
+def random_parameters(no_sets, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        "v_max": rng.uniform(10, 30, no_sets),
+        "m_veh": rng.uniform(180, 260, no_sets),
+        "mu": rng.uniform(1.2, 1.8, no_sets),
+        "C_L": rng.uniform(1.5, 3.5, no_sets),
+        "torque": rng.uniform(15, 30, no_sets),
+    }
+
+def test_default_vehicle_matches_the_planner(track):
+    _, radii, arc_lengths = track
+    planner = nvp.VelocityPlanner(25)
+    vx = np.empty(len(radii))
+    vx[0] = 2.0
+    vx[1:] = np.minimum(planner.cornering_speed_limit(radii), 25)[:-1]
+    planner.profile_with_acceleration_helper(False, vx, radii, arc_lengths)
+    planner.profile_with_acceleration_helper(True, vx, radii, arc_lengths)
+    lap_times, profiles = parametersweep.evaluate_parameters(radii, arc_lengths, {"v_max": [25.0]}, v_current=2.0)
+    np.testing.assert_array_equal(profiles[0], vx)
+    np.testing.assert_allclose(lap_times[0], np.sum(2 * arc_lengths / (vx[:-1] + vx[1:])))
+
+def test_parameter_sets_are_independent(track):
+    _, radii, arc_lengths = track
+    parameters = random_parameters(20)
+    lap_times, profiles = parametersweep.evaluate_parameters(radii, arc_lengths, parameters)
+    for i in (0, 7, 19):
+        single = {name: column[i:i + 1] for name, column in parameters.items()}
+        lap_time, profile = parametersweep.evaluate_parameters(radii, arc_lengths, single)
+        np.testing.assert_array_equal(profile[0], profiles[i])
+        # the lap time sums are the only thing that depends on how many sets there are, through the summation order
+        np.testing.assert_allclose(lap_time[0], lap_times[i], rtol=1e-13)
+
+def test_closed_lap_matches_the_planner(track):
+    midpoints, _, _ = track
+    circles = get_circles(midpoints, closed=True)
+    radii, arc_lengths = circles[1], get_arc_lengths(midpoints, circles, closed=True)[0]
+    planner = nvp.VelocityPlanner(25)
+    vx = np.roll(np.minimum(planner.cornering_speed_limit(radii), 25), 1)
+    planner.periodic_acceleration_helper(False, vx, radii, arc_lengths)
+    planner.periodic_acceleration_helper(True, vx, radii, arc_lengths)
+    _, profiles = parametersweep.evaluate_parameters(radii, arc_lengths, {"v_max": [25.0]}, closed=True)
+    np.testing.assert_allclose(profiles[0], vx, rtol=1e-12)
+
+def test_process_pool_matches_one_process(track):
+    midpoints, radii, arc_lengths = track
+    parameters = random_parameters(50, seed=1)
+    expected = parametersweep.evaluate_parameters(radii, arc_lengths, parameters)
+    for workers in (1, 2):
+        lap_times, profiles = parametersweep.sweep_parameters(midpoints, parameters, workers=workers, chunk_size=16)
+        np.testing.assert_array_equal(lap_times, expected[0])
+        np.testing.assert_array_equal(profiles, expected[1])
+
+@pytest.mark.parametrize("closed", [False, True])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_empty_table(track, closed, workers):
+    midpoints = track[0]
+    lap_times, profiles = parametersweep.sweep_parameters(midpoints, {"v_max": []}, closed=closed, workers=workers)
+    assert lap_times.shape == (0,) and profiles.shape == (0, len(midpoints))
+
+def test_parameter_table_checks_its_columns():
+    with pytest.raises(ValueError):
+        parametersweep.get_parameter_table({"mu": [1.0]})
+    with pytest.raises(ValueError):
+        parametersweep.get_parameter_table({"v_max": [20.0], "wings": [1.0]})
+    with pytest.raises(ValueError):
+        parametersweep.get_parameter_table({"v_max": [20.0, 25.0], "mu": [1.0]})
+    table = parametersweep.get_parameter_table(np.array([(20.0, 1.4)], dtype=[("v_max", float), ("mu", float)]))
+    assert table["mu"][0] == 1.4 and table["m_veh"][0] == nvp.m_veh
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+import delauney as dlny
+import instrumentation
+
+@pytest.fixture
+def triangulation():
+    cones = np.random.default_rng(0).uniform(0, 100, (500, 2))
+    return dlny.get_triangulation_from_cones(cones)
+
+def random_points(seed, no_points=2000):
+    # a few of them outside the hull of the cones
+    return np.random.default_rng(seed).uniform(-10, 110, (no_points, 2))
+
+def check_location(triangulation, points, location):
+    np.testing.assert_array_equal(location.simplices, triangulation.find_simplex(points))
+    outside = location.simplices < 0
+    np.testing.assert_array_equal(location.outside, outside)
+    assert np.all(location.vertices[outside] == -1) and np.all(np.isnan(location.barycentric[outside]))
+    inside = ~outside
+    np.testing.assert_array_equal(location.vertices[inside], triangulation.simplices[location.simplices[inside]])
+    # the barycentric coordinates rebuild the points from the corners of their triangles
+    corners = triangulation.points[location.vertices[inside]]
+    np.testing.assert_allclose(np.einsum("nk,nkd->nd", location.barycentric[inside], corners), points[inside], atol=1e-9)
+    assert np.all(location.barycentric[inside] >= -1e-12)
+
+def test_matches_find_simplex(triangulation):
+    points = random_points(1)
+    location = dlny.locate_points(triangulation, points)
+    assert location.outside.any() and not location.outside.all()
+    check_location(triangulation, points, location)
+
+def test_any_hints_give_the_same_result(triangulation):
+    points = random_points(2)
+    rng = np.random.default_rng(2)
+    for hints in (rng.integers(-1, len(triangulation.simplices), len(points)),
+                  np.full(len(points), -1),
+                  triangulation.find_simplex(points)):
+        check_location(triangulation, points, dlny.locate_points(triangulation, points, hints))
+
+def test_locator_uses_last_frame_as_hints(triangulation):
+    points = np.random.default_rng(3).uniform(0, 100, (2000, 2))
+    locator = dlny.PointLocator(triangulation)
+    recorder = instrumentation.enable()
+    try:
+        check_location(triangulation, points, locator.locate(points))
+        for frame in range(5):
+            points = points + np.random.default_rng(frame).normal(0, 0.2, points.shape)
+            check_location(triangulation, points, locator.locate(points))
+    finally:
+        instrumentation.disable()
+    searched = [record["counts"]["find_simplex"] for record in recorder.records if record["stage"] == "locate_points"]
+    assert searched[0] == len(points)
+    # most points stay in their triangle or move into a neighbour
+    assert max(searched[1:]) < len(points) // 4
+
+def test_locator_forgets_hints_for_new_triangulation(triangulation):
+    points = random_points(4)
+    locator = dlny.PointLocator(triangulation)
+    locator.locate(points)
+    other = dlny.get_triangulation_from_cones(np.random.default_rng(5).uniform(0, 100, (300, 2)))
+    locator.set_triangulation(other)
+    check_location(other, points, locator.locate(points))
+    # a different number of points does not use the hints either
+    check_location(other, points[:100], locator.locate(points[:100]))
+
+def test_no_points(triangulation):
+    location = dlny.locate_points(triangulation, np.empty((0, 2)), hints=np.empty(0, dtype=int))
+    assert location.simplices.shape == (0,) and location.barycentric.shape == (0, 3)
@@ -0,0 +1,27 @@
+import numpy as np
+from centerline import find_centerline
+from trackfile import TrackFile
+from tracks import circle_cones
+
+def test_set_cones_from_its_own_memory_map(tmp_path):
+    track = TrackFile.create(tmp_path, circle_cones())
+    track = TrackFile.open(tmp_path)
+    expected = np.array(track.cones.records)
+    track.set_cones(track.cones)
+    np.testing.assert_array_equal(TrackFile.open(tmp_path).cones.records, expected)
+    np.testing.assert_array_equal(track.cones.records, expected)
+
+def test_layers_are_reused_until_the_cones_change(tmp_path):
+    cones = circle_cones()
+    track = TrackFile.create(tmp_path, cones)
+    midpoints = np.array(track.midpoints)
+    curvature = np.array(track.curvature)
+    reopened = TrackFile.open(tmp_path, writable=False)
+    np.testing.assert_array_equal(reopened.midpoints, midpoints)
+    assert isinstance(reopened.curvature, np.memmap)
+    np.testing.assert_array_equal(reopened.curvature, curvature)
+
+    moved = TrackFile.create(tmp_path / "moved", cones + 1.0).cones
+    track.set_cones(moved)
+    expected = find_centerline(moved.cones, moved.colors).midpoints
+    np.testing.assert_array_equal(TrackFile.open(tmp_path).midpoints, expected)
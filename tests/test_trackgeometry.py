@@ -0,0 +1,69 @@
+import math
+import numpy as np
+import pytest
+from trackgeometry import circle_through_points, get_circles, get_arc_lengths
+import delauney as dlny
+from tracks import stadium_centerline, stadium_cones
+
+def scalar_circle(p1, p2, p3):
+    # the circumcircle from the perpendicular bisectors, one triple at a time
+    (x1, y1), (x2, y2), (x3, y3) = p1, p2, p3
+    d = 2 * (x1 * (y2 - y3) + x2 * (y3 - y1) + x3 * (y1 - y2))
+    ux = ((x1 * x1 + y1 * y1) * (y2 - y3) + (x2 * x2 + y2 * y2) * (y3 - y1) + (x3 * x3 + y3 * y3) * (y1 - y2)) / d
+    uy = ((x1 * x1 + y1 * y1) * (x3 - x2) + (x2 * x2 + y2 * y2) * (x1 - x3) + (x3 * x3 + y3 * y3) * (x2 - x1)) / d
+    return (ux, uy), math.hypot(x1 - ux, y1 - uy)
+
+def test_circles_match_scalar_fit():
+    rng = np.random.default_rng(1)
+    points = rng.uniform(-50, 50, (3, 200, 2))
+    centers, radii = circle_through_points(*points)
+    for i in range(200):
+        center, radius = scalar_circle(points[0, i], points[1, i], points[2, i])
+        np.testing.assert_allclose(centers[i], center, rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(radii[i], radius, rtol=1e-9)
+
+def test_collinear_and_repeated_points_have_no_circle():
+    centers, radii = circle_through_points([[0, 0], [0, 0]], [[1, 1], [0, 0]], [[2, 2], [3, 1]])
+    assert np.all(np.isinf(radii))
+    assert np.all(np.isnan(centers))
+
+def test_open_track_repeats_the_last_circle():
+    midpoints = stadium_centerline()[:40]
+    centers, radii = get_circles(midpoints)
+    assert len(radii) == len(midpoints)
+    assert radii[-1] == radii[-2] == radii[-3]
+
+@pytest.mark.parametrize("closed", [False, True])
+def test_arc_lengths_on_a_circle(closed):
+    angles = np.linspace(0, 2 * np.pi, 37)[:-1] if closed else np.linspace(0, np.pi, 19)
+    midpoints = 10 * np.column_stack((np.cos(angles), np.sin(angles)))
+    arc_lengths, station = get_arc_lengths(midpoints, get_circles(midpoints, closed), closed)
+    np.testing.assert_allclose(arc_lengths, 10 * np.pi / 18, rtol=1e-12)
+    np.testing.assert_allclose(station, np.cumsum(arc_lengths))
+    assert len(arc_lengths) == len(midpoints) - (not closed)
+
+def test_nearly_straight_segments_stay_near_the_chord():
+    # the midpoints of the stadium have nearly collinear triples with radii in the 1e15s, where the acos
+    # of the angle between the radii rounds to a tiny but wrong angle
+    midpoints = dlny.find_track_midpoints(stadium_cones(), closed=True)
+    circles = get_circles(midpoints, closed=True)
+    arc_lengths, _ = get_arc_lengths(midpoints, circles, closed=True)
+    chord = np.hypot(*(np.roll(midpoints, -1, axis=0) - midpoints).T)
+    assert circles[1][np.isfinite(circles[1])].max() > 1e12
+    # a minor arc is at most pi / 2 times its chord
+    assert np.all(arc_lengths <= np.pi / 2 * chord)
+    assert np.all(arc_lengths >= chord * (1 - 1e-12))
+
+def test_stadium_lap_length():
+    midpoints = stadium_centerline(straight=60.0, radius=8.0, spacing=0.5)
+    _, station = get_arc_lengths(midpoints, get_circles(midpoints, closed=True), closed=True)
+    np.testing.assert_allclose(station[-1], 2 * 60.0 + 2 * np.pi * 8.0, rtol=1e-3)
+
+@pytest.mark.parametrize("closed", [False, True])
+@pytest.mark.parametrize("no_points", [0, 1, 2])
+def test_circles_need_three_midpoints(closed, no_points):
+    with pytest.raises(ValueError):
+        get_circles(stadium_centerline()[:no_points], closed)
+    centers, radii = get_circles([[0, 0], [1, 0], [0, 1]], closed)
+    np.testing.assert_allclose(centers, 0.5)
+    np.testing.assert_allclose(radii, np.sqrt(0.5))
@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import delauney as dlny
+from trackwidth import ClearanceField, get_track_width
+
+def brute_force_distances(points, cones, max_spacing):
+    # segment between the two nearest cones, or the nearest cone when they are too far apart
+    result = np.empty(len(points))
+    for i, point in enumerate(points):
+        distances = np.hypot(*(cones - point).T)
+        first, second = np.argsort(distances)[:2]
+        a, b = cones[first], cones[second]
+        if np.hypot(*(b - a)) > max_spacing:
+            result[i] = distances[first]
+            continue
+        t = np.clip(np.dot(point - a, b - a) / np.dot(b - a, b - a), 0, 1)
+        result[i] = np.hypot(*(point - a - t * (b - a)))
+    return result
+
+@pytest.fixture
+def cones():
+    rng = np.random.default_rng(0)
+    return rng.uniform(0, 100, (600, 2)), rng.integers(0, 2, 600)
+
+@pytest.mark.parametrize("max_spacing", [3.0, 10.0])
+def test_matches_brute_force(cones, max_spacing):
+    cones, colors = cones
+    points = np.random.default_rng(1).uniform(-10, 110, (300, 2))
+    clearance = ClearanceField(cones, colors, max_spacing).query(points)
+    np.testing.assert_allclose(clearance.left, brute_force_distances(points, cones[colors == dlny.BLUE], max_spacing), rtol=1e-12)
+    np.testing.assert_allclose(clearance.right, brute_force_distances(points, cones[colors == dlny.YELLOW], max_spacing), rtol=1e-12)
+    np.testing.assert_array_equal(clearance.width, clearance.left + clearance.right)
+    for values in clearance:
+        assert values.flags.c_contiguous and values.dtype == np.float64
+
+@pytest.mark.parametrize("rebuild_fraction", [0.0, 0.25, 10.0])
+def test_added_cones_match_a_batch_build(cones, rebuild_fraction):
+    cones, colors = cones
+    points = np.random.default_rng(2).uniform(0, 100, (300, 2))
+    field = ClearanceField(rebuild_fraction=rebuild_fraction)
+    for batch in np.array_split(np.arange(len(cones)), 17):
+        field.add_cones(cones[batch], colors[batch])
+    expected = ClearanceField(cones, colors).query(points)
+    for values, expected_values in zip(field.query(points), expected):
+        np.testing.assert_array_equal(values, expected_values)
+
+def test_straight_track():
+    x = np.arange(0, 40, 2.0)
+    yellow = np.column_stack((x, np.zeros_like(x)))
+    blue = np.column_stack((x, np.full_like(x, 4.0)))
+    cones = dlny.combine_yellow_and_blue_cones(yellow, blue)
+    midpoints = np.column_stack((np.arange(5, 30, 0.7), np.full(36, 1.0)))
+    clearance = get_track_width(midpoints, cones)
+    np.testing.assert_allclose(clearance.left, 3.0)
+    np.testing.assert_allclose(clearance.right, 1.0)
+    np.testing.assert_allclose(clearance.width, 4.0)
+
+def test_gaps_use_the_nearest_cone():
+    # two yellow cones 20 m apart, further than max_spacing
+    field = ClearanceField([[0.0, 0.0], [20.0, 0.0]], [dlny.YELLOW, dlny.YELLOW], max_spacing=10.0)
+    clearance = field.query([[10.0, 1.0]])
+    np.testing.assert_allclose(clearance.right, [np.hypot(10.0, 1.0)])
+    assert np.isinf(clearance.left[0]) and np.isinf(clearance.width[0])
+
+def test_no_cones():
+    clearance = ClearanceField().query(np.zeros((3, 2)))
+    assert np.all(np.isinf(clearance.left)) and np.all(np.isinf(clearance.right))
+
+def test_small_adds_keep_the_big_tree(monkeypatch):
+    import scipy.spatial
+    built = []
+    tree_class = scipy.spatial.cKDTree
+    def spy(points, *args, **kwargs):
+        built.append(len(points))
+        return tree_class(points, *args, **kwargs)
+    rng = np.random.default_rng(3)
+    field = ClearanceField(rng.uniform(0, 100, (10000, 2)), np.zeros(10000, dtype=int), rebuild_fraction=0.25)
+    big_tree = field._boundaries[dlny.YELLOW].trees[0][1]
+
+    monkeypatch.setattr(scipy.spatial, "cKDTree", spy)
+    for _ in range(20):
+        field.add_cones(rng.uniform(0, 100, (10, 2)), np.zeros(10, dtype=int))
+    # only the small tree over the added cones is built, never the big one again
+    assert built == list(range(10, 210, 10))
+    assert field._boundaries[dlny.YELLOW].trees[0][1] is big_tree
+
+    # once the small tree holds more than rebuild_fraction of the big one, they are merged
+    field.add_cones(rng.uniform(0, 100, (2400, 2)), np.zeros(2400, dtype=int))
+    assert built[-1] == 12600 and len(field._boundaries[dlny.YELLOW].trees) == 1
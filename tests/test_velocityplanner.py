@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+import NewVelocityPlanner as nvp
+
+MODES = ["accel_forw", "decel_backw", "decel_forw", "accel_backw"]
+
+@pytest.fixture
+def planner():
+    return nvp.VelocityPlanner(30)
+
+def test_max_accel_array_matches_scalar(planner):
+    rng = np.random.default_rng(3)
+    speeds = rng.uniform(0, 40, 500)
+    radii = np.concatenate((rng.uniform(1, 200, 490), [np.inf] * 5, [0.0] * 5))
+    modes = rng.choice(MODES, 500)
+    result = planner.max_accel_array(speeds, radii, modes)
+    expected = [planner.max_accel(v, r, mode) for v, r, mode in zip(speeds.tolist(), radii.tolist(), modes.tolist())]
+    np.testing.assert_array_equal(result, expected)
+
+def test_cornering_speed_saturates_the_tires(planner):
+    radii = np.array([2.0, 5.0, 10.0, 20.0, 50.0])
+    speeds = planner.cornering_speed_limit(radii)
+    grip = nvp.mu * (9.81 + 0.5 * nvp.rho * nvp.C_L * nvp.A * speeds * speeds / nvp.m_veh)
+    np.testing.assert_allclose(speeds * speeds / radii, grip, rtol=1e-12)
+    # just above the limit the tires have no grip left to accelerate with, only drag acts
+    faster = speeds * 1.001
+    drag = -0.5 * nvp.rho * nvp.A * nvp.C_D * faster * faster / nvp.m_veh
+    np.testing.assert_allclose(planner.max_accel_array(faster, radii, "accel_forw"), drag, rtol=1e-12)
+
+def test_downforce_lifts_the_limit_on_large_radii(planner):
+    k = nvp.mu * 0.5 * nvp.rho * nvp.C_L * nvp.A / nvp.m_veh
+    assert np.isinf(planner.cornering_speed_limit([1.01 / k, np.inf])).all()
+    assert np.isfinite(planner.cornering_speed_limit(0.99 / k))
+
+def sequential_sweep(planner, backwards, vx, radii, arc_lengths):
+    # the plain waypoint by waypoint sweep, every speed capped by what the previous one can reach
+    vx = vx.copy()
+    if backwards:
+        for j in range(len(vx) - 1, 0, -1):
+            vx[j - 1] = min(vx[j - 1], planner.reachable_speed(True, vx[j], radii[j], radii[j - 1], arc_lengths[j - 1]))
+    else:
+        for i in range(len(vx) - 1):
+            vx[i + 1] = min(vx[i + 1], planner.reachable_speed(False, vx[i], radii[i], None, arc_lengths[i]))
+    return vx
+
+@pytest.mark.parametrize("seed", range(3))
+def test_sweeps_match_sequential_sweep(planner, seed):
+    rng = np.random.default_rng(seed)
+    no_points = 2000
+    # noisy curvature, with a few tight corners and straights
+    radii = 1 / np.abs(rng.normal(0, 0.05, no_points))
+    radii[rng.choice(no_points, 40)] = rng.uniform(2, 6, 40)
+    radii[rng.choice(no_points, 40)] = np.inf
+    arc_lengths = rng.uniform(0.2, 3.0, no_points - 1)
+    vx = np.minimum(planner.cornering_speed_limit(radii), planner.v_max)
+    vx[0] = 0.0
+    for backwards in (False, True):
+        expected = sequential_sweep(planner, backwards, vx, radii, arc_lengths)
+        result = vx.copy()
+        assert planner.profile_with_acceleration_helper(backwards, result, radii, arc_lengths) is result
+        np.testing.assert_array_equal(result, expected)
+        vx = expected
+
+def random_track(rng, no_points, spacing=1.5):
+    # a winding open track, the heading changes by a random amount at every midpoint
+    heading = np.cumsum(rng.normal(0, 0.08, no_points))
+    steps = spacing * np.column_stack((np.cos(heading), np.sin(heading)))
+    return np.cumsum(steps, axis=0)
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("shrinking", [False, True])
+def test_replan_matches_calculate_profile(seed, shrinking):
+    rng = np.random.default_rng(seed)
+    track = random_track(rng, 700)
+    planner = nvp.VelocityPlanner(25)
+    no_seen, station, v_current = 60, 0.0, 0.0
+    for cycle in range(150):
+        no_seen = min(no_seen + int(rng.integers(0, 4)), len(track))
+        if shrinking and rng.random() < 0.2:
+            # the last few midpoints are dropped again, e.g a false detection at the end of the map
+            no_seen = max(no_seen - int(rng.integers(1, 12)), int(station / 1.5) + 20)
+        if rng.random() < 0.3:
+            # a detection moves one of the midpoints ahead of the car
+            index = int(rng.integers(no_seen // 2, no_seen))
+            track[index] += rng.normal(0, 0.2, 2)
+        midpoints = track[:no_seen]
+        profile = planner.replan(midpoints, station, v_current)
+        start = no_seen - len(profile)
+        expected = nvp.VelocityPlanner(25).calculate_profile(midpoints[start:].copy(), v_current)
+        np.testing.assert_array_equal(profile, expected)
+        station += rng.uniform(0.0, 1.0)
+        v_current = float(profile[1])
+
+def test_replan_on_a_prefix_of_the_midpoints():
+    track = random_track(np.random.default_rng(7), 150)
+    planner = nvp.VelocityPlanner(25)
+    planner.replan(track, 0.0, 0.0)
+    profile = planner.replan(track[:120], 0.0, 0.0)
+    np.testing.assert_array_equal(profile, nvp.VelocityPlanner(25).calculate_profile(track[:120].copy(), 0.0))
+
+def test_replan_needs_room_ahead():
+    planner = nvp.VelocityPlanner(25)
+    with pytest.raises(ValueError):
+        planner.replan(random_track(np.random.default_rng(0), 10), 1000.0, 0.0)
+
+@pytest.mark.parametrize("closed", [False, True])
+def test_smoothing_stays_under_the_envelope(closed):
+    rng = np.random.default_rng(4)
+    envelope = np.abs(np.cumsum(rng.normal(0, 1, 400))) + 1
+    smoothed = nvp.smooth_envelope(envelope, 5, closed=closed)
+    assert np.all(smoothed <= envelope)
+    # a constant profile is left alone
+    np.testing.assert_array_equal(nvp.smooth_envelope(np.full(50, 7.0), 5, closed=closed), 7.0)
+
+def test_closed_smoothing_wraps_around():
+    envelope = np.abs(np.cumsum(np.random.default_rng(5).normal(0, 1, 300))) + 1
+    smoothed = nvp.smooth_envelope(envelope, 4, closed=True)
+    np.testing.assert_allclose(nvp.smooth_envelope(np.roll(envelope, 37), 4, closed=True), np.roll(smoothed, 37), rtol=1e-14)
+
+@pytest.mark.parametrize("closed", [False, True])
+def test_smoothing_a_range_matches_the_full_pass(closed):
+    envelope = np.abs(np.cumsum(np.random.default_rng(6).normal(0, 1, 300))) + 1
+    full = nvp.smooth_envelope(envelope, 5, closed=closed)
+    out = np.full(300, np.nan)
+    for start, stop in ((0, 3), (3, 120), (120, 297), (297, 300)):
+        nvp.smooth_envelope(envelope, 5, closed=closed, start=start, stop=stop, out=out)
+    np.testing.assert_array_equal(out, full)
+
+def test_profile_stays_within_the_limits():
+    midpoints = random_track(np.random.default_rng(7), 500)
+    planner = nvp.VelocityPlanner(20, smoothener=5)
+    profile = planner.calculate_profile(midpoints, 0.0)
+    circles = nvp.get_circles(midpoints)
+    assert profile[0] == 0.0
+    assert np.all(profile[1:] <= np.minimum(planner.cornering_speed_limit(circles[1][:-1]), 20) + 1e-12)
@@ -0,0 +1,29 @@
+import numpy as np
+import delauney as dlny
+
+def circle_cones(radius=20.0, width=6.0, no_pairs=24):
+    """Alternating yellow and blue cones around a circular lap, yellow on the inside"""
+    angles = np.linspace(0, 2 * np.pi, no_pairs, endpoint=False)
+    yellow = np.column_stack((radius * np.cos(angles), radius * np.sin(angles)))
+    blue = np.column_stack(((radius + width) * np.cos(angles), (radius + width) * np.sin(angles)))
+    return dlny.combine_yellow_and_blue_cones(yellow, blue)
+
+def stadium_centerline(straight=60.0, radius=8.0, spacing=2.0):
+    """Points every spacing metres around a lap of two straights joined by tight half circles,
+    counterclockwise, starting halfway down the bottom straight"""
+    half = straight / 2
+    bottom = np.column_stack((np.arange(0, half, spacing), np.full(int(np.ceil(half / spacing)), -radius)))
+    angles = np.arange(-np.pi / 2, np.pi / 2, spacing / radius)
+    right = np.column_stack((half + radius * np.cos(angles), radius * np.sin(angles)))
+    top = np.column_stack((np.arange(half, -half, -spacing), np.full(int(np.ceil(straight / spacing)), radius)))
+    left = np.column_stack((-half - radius * np.cos(angles), -radius * np.sin(angles)))
+    back = np.column_stack((np.arange(-half, 0, spacing), np.full(int(np.ceil(half / spacing)), -radius)))
+    return np.concatenate((bottom, right, top, left, back))
+
+def stadium_cones(width=4.0, **kwargs):
+    """Alternating yellow and blue cones either side of stadium_centerline, blue on the left"""
+    centerline = stadium_centerline(**kwargs)
+    tangents = np.roll(centerline, -1, axis=0) - np.roll(centerline, 1, axis=0)
+    tangents /= np.hypot(tangents[:, 0], tangents[:, 1])[:, None]
+    left = np.column_stack((-tangents[:, 1], tangents[:, 0]))
+    return dlny.combine_yellow_and_blue_cones(centerline - width / 2 * left, centerline + width / 2 * left)
@@ -0,0 +1,190 @@
+import json
+import os
+import numpy as np
+import delauney as dlny
+import NewVelocityPlanner as nvp
+from centerline import find_centerline
+from conemap import ConeMap
+from geometrycache import content_hash
+from trackgeometry import get_circles, get_arc_lengths
+
+# version of the code that computes every kind of layer, bump one when its computation changes
+# and the layers of that kind saved by older code are recomputed the next time they are used
+LAYER_VERSIONS = {
+    "cones": 1,
+    "midpoints": 1,
+    "curvature": 1,
+    "station": 1,
+    "profile": 1,
+}
+
+MANIFEST = "manifest.json"
+
+class TrackFile:
+    """A track saved as a directory of .npy layers plus a manifest
+
+    The cones are the only layer that has to be there. The derived layers (the ordered midpoints,
+    the curvature and station along them, and the speed profiles of different vehicles) are computed
+    the first time they are asked for and saved next to the cones, so the next run just maps them.
+
+    Every layer is listed in manifest.json with the hash of its content, the hash of what it was
+    computed from (its source: the hashes of the layers it uses and its settings) and the
+    LAYER_VERSIONS version of the code that computed it. A layer whose source or version no longer
+    matches is stale and is recomputed. Opening a track only reads the manifest, the sources are
+    checked against the hashes in the manifest, and a layer is memory-mapped when it is first used,
+    so a planner that only needs the curvature never reads the cones or the midpoints.
+    """
+    def __init__(self, path, manifest, writable=True):
+        self.path = path
+        self.writable = writable
+        self._manifest = manifest
+        self._layers = {}
+
+    @classmethod
+    def create(cls, path, cones, colors=None, closed=True):
+        """Starts a new track file from its cones, replacing any track already at path
+
+        Parameters
+        ----------
+        path: the directory of the track, it is created if needed
+
+        cones: a ConeMap, or an array of (x,y) cone coordinates
+
+        colors: the colour of every cone when cones is an array, None means the yellow and blue cones alternate
+
+        closed: if True the cones go around a closed lap
+
+        Returns
+        -------
+        The TrackFile
+        """
+        if not isinstance(cones, ConeMap):
+            cones = np.asarray(cones, dtype=float).reshape(-1, 2)
+            colors = dlny.get_alternating_colors(len(cones)) if colors is None else colors
+            cone_map = ConeMap()
+            cone_map.append(cones, colors)
+            cones = cone_map
+        os.makedirs(path, exist_ok=True)
+        track = cls(path, {"closed": bool(closed), "layers": {}})
+        track.set_cones(cones)
+        return track
+
+    @classmethod
+    def open(cls, path, writable=True):
+        """Opens a track file, only the manifest is read
+
+        Parameters
+        ----------
+        path: the directory of the track
+
+        writable: if False, layers that are missing or stale are computed but not saved
+        """
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        return cls(path, manifest, writable)
+
+    @property
+    def closed(self):
+        """True if the track is a closed lap"""
+        return self._manifest["closed"]
+
+    def layers(self):
+        """The names of the layers in the track file"""
+        return list(self._manifest["layers"])
+
+    def _read(self, name):
+        if name not in self._layers:
+            file = os.path.join(self.path, self._manifest["layers"][name]["file"])
+            self._layers[name] = np.load(file, mmap_mode="r", allow_pickle=False)
+        return self._layers[name]
+
+    def _write(self, name, data, kind, source):
+        data = np.ascontiguousarray(data)
+        self._layers[name] = data
+        self._manifest["layers"][name] = {
+            "file": name + ".npy",
+            "version": LAYER_VERSIONS[kind],
+            "hash": content_hash(data),
+            "source": source,
+            "shape": list(data.shape),
+        }
+        if not self.writable:
+            return
+        # write to temporary files first, so a crash never leaves half a file behind, and a layer
+        # saved from its own memory map (e.g set_cones(track.cones)) is read before its file is replaced
+        temporary = os.path.join(self.path, name + ".npy.tmp")
+        with open(temporary, "wb") as f:
+            np.save(f, data, allow_pickle=False)
+        os.replace(temporary, os.path.join(self.path, name + ".npy"))
+        temporary = os.path.join(self.path, MANIFEST + ".tmp")
+        with open(temporary, "w") as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(temporary, os.path.join(self.path, MANIFEST))
+
+    def _layer(self, name, kind, source, compute):
+        # the saved layer if the same version of the code computed it from the same source, otherwise compute and save it
+        entry = self._manifest["layers"].get(name)
+        if entry is None or entry["version"] != LAYER_VERSIONS[kind] or entry["source"] != source:
+            self._write(name, compute(), kind, source)
+        return self._read(name)
+
+    def _layer_hash(self, name):
+        # content hash of a layer, making sure it is up to date first
+        getattr(self, name)
+        return self._manifest["layers"][name]["hash"]
+
+    @property
+    def cones(self):
+        """The ConeMap of the track, backed by the memory-mapped file"""
+        return ConeMap.from_records(self._read("cones"))
+
+    def set_cones(self, cones):
+        """Replaces the cones with a ConeMap, the derived layers go stale and are recomputed when they are used"""
+        self._write("cones", cones.records, "cones", "")
+
+    @property
+    def midpoints(self):
+        """(N, 2) array of the ordered midpoints of the track, from centerline.find_centerline"""
+        def compute():
+            cone_map = self.cones
+            return find_centerline(cone_map.cones, cone_map.colors).midpoints
+        return self._layer("midpoints", "midpoints", self._manifest["layers"]["cones"]["hash"], compute)
+
+    @property
+    def curvature(self):
+        """The curvature (1 / radius from trackgeometry.get_circles) at every midpoint, 0 on straights"""
+        source = content_hash(self._layer_hash("midpoints"), self.closed)
+        return self._layer("curvature", "curvature", source, lambda: 1 / get_circles(self.midpoints, self.closed)[1])
+
+    @property
+    def station(self):
+        """The distance along the track at the end of every segment, from trackgeometry.get_arc_lengths"""
+        def compute():
+            midpoints = self.midpoints
+            return get_arc_lengths(midpoints, get_circles(midpoints, self.closed), self.closed)[1]
+        source = content_hash(self._layer_hash("midpoints"), self.closed)
+        return self._layer("station", "station", source, compute)
+
+    def profile(self, v_max, smoothener=5, v_current=0.0):
+        """The speed profile of a vehicle, from NewVelocityPlanner.VelocityPlanner.calculate_profile
+
+        Every vehicle setup (v_max, smoothener, v_current and the vehicle constants of
+        NewVelocityPlanner) is saved as a layer of its own.
+
+        Parameters
+        ----------
+        v_max: the top speed of the vehicle
+
+        smoothener: the smoothing window of the planner
+
+        v_current: the speed at the first midpoint (open tracks only)
+
+        Returns
+        -------
+        The speed at every midpoint
+        """
+        vehicle = (float(v_max), smoothener, float(v_current), nvp.m_veh, nvp.mu, nvp.C_L, nvp.C_D, nvp.A)
+        source = content_hash(self._layer_hash("midpoints"), self.closed, *vehicle)
+        planner = nvp.VelocityPlanner(v_max, smoothener)
+        compute = lambda: planner.calculate_profile(np.asarray(self.midpoints), v_current, self.closed)
+        return self._layer("profile_" + content_hash(*vehicle), "profile", source, compute)
@@ -0,0 +1,111 @@
+import numpy as np
+
+def circle_through_points(p1, p2, p3):
+    """Finds the circles passing through batches of three points
+
+    Parameters
+    ----------
+    p1, p2, p3: arrays of point coordinates with shape (N, 2), the i-th circle
+    passes through p1[i], p2[i] and p3[i]
+
+    Returns
+    -------
+    A tuple (centers, radii) where centers has shape (N, 2) and radii has shape (N,).
+    Collinear or repeated points have no circle, so they get an infinite radius
+    and a NaN center.
+    """
+    p1 = np.asarray(p1, dtype=float)
+    a = np.asarray(p2, dtype=float) - p1
+    b = np.asarray(p3, dtype=float) - p1
+
+    # solve for the center relative to p1, which keeps the numbers small on tracks far from the origin
+    a_sq = a[:, 0] * a[:, 0] + a[:, 1] * a[:, 1]
+    b_sq = b[:, 0] * b[:, 0] + b[:, 1] * b[:, 1]
+    d = 2 * (a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0])
+
+    collinear = d == 0
+    d = np.where(collinear, 1.0, d)
+    ux = (b[:, 1] * a_sq - a[:, 1] * b_sq) / d
+    uy = (a[:, 0] * b_sq - b[:, 0] * a_sq) / d
+
+    centers = np.empty_like(p1)
+    centers[:, 0] = p1[:, 0] + ux
+    centers[:, 1] = p1[:, 1] + uy
+    radii = np.sqrt(ux * ux + uy * uy)
+
+    centers[collinear] = np.nan
+    radii[collinear] = np.inf
+    return centers, radii
+
+def get_circles(midpoints, closed=False):
+    """Fits a circle through every three consecutive midpoints
+
+    Parameters
+    ----------
+    midpoints: array of (x,y) coordinates of the track midpoints, shape (N, 2)
+
+    closed: if True the midpoints form a closed lap, so the circles wrap around
+    from the last midpoint back to the first
+
+    Returns
+    -------
+    A tuple (centers, radii) with one entry per midpoint. Entry i is the circle through
+    midpoints i, i+1 and i+2. On an open track the last two entries repeat the last circle.
+    Straight sections have an infinite radius.
+
+    Raises ValueError when there are fewer than three midpoints, a circle needs three.
+    """
+    midpoints = np.asarray(midpoints, dtype=float)
+    if len(midpoints) < 3:
+        raise ValueError(f"fitting circles needs at least 3 midpoints, got {len(midpoints)}")
+    if closed:
+        return circle_through_points(midpoints, np.roll(midpoints, -1, axis=0), np.roll(midpoints, -2, axis=0))
+
+    n = len(midpoints)
+    centers = np.empty((n, 2))
+    radii = np.empty(n)
+
+    centers[:n - 2], radii[:n - 2] = circle_through_points(midpoints[:-2], midpoints[1:-1], midpoints[2:])
+    centers[n - 2:] = centers[n - 3]
+    radii[n - 2:] = radii[n - 3]
+    return centers, radii
+
+def get_arc_lengths(midpoints, circles, closed=False):
+    """Finds the arc length between consecutive midpoints and the running sum along the track
+
+    Parameters
+    ----------
+    midpoints: array of (x,y) coordinates of the track midpoints, shape (N, 2)
+
+    circles: the (centers, radii) tuple returned by get_circles
+
+    closed: if True the midpoints form a closed lap and there is one more segment,
+    from the last midpoint back to the first
+
+    Returns
+    -------
+    A tuple (arc_lengths, station), both with shape (N - 1,), or (N,) for a closed lap.
+    arc_lengths[i] is the length from midpoint i to midpoint i+1 along circle i,
+    straight segments use the chord length. station is the running sum of arc_lengths.
+    """
+    midpoints = np.asarray(midpoints, dtype=float)
+    centers, radii = circles
+    if closed:
+        start = midpoints
+        end = np.roll(midpoints, -1, axis=0)
+    else:
+        start = midpoints[:-1]
+        end = midpoints[1:]
+        centers = centers[:-1]
+        radii = radii[:-1]
+
+    chord = end - start
+    chord = np.sqrt(chord[:, 0] * chord[:, 0] + chord[:, 1] * chord[:, 1])
+
+    # the angle of the arc from its chord, 2 * asin(chord / 2r). Unlike the acos of the angle between the
+    # radii this stays accurate for nearly straight segments, where the radius is huge and the angle tiny
+    with np.errstate(invalid="ignore"):
+        arc = 2 * radii * np.arcsin(np.minimum(chord / (2 * radii), 1.0))
+
+    arc_lengths = np.where(np.isfinite(radii), np.maximum(arc, chord), chord)
+    return arc_lengths, np.cumsum(arc_lengths)
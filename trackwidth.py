@@ -0,0 +1,158 @@
+from collections import namedtuple
+import numpy as np
+import delauney as dlny
+import instrumentation
+from centerline import _orient_chain
+
+# left: distance from every point to the blue boundary, right: to the yellow boundary, width: left + right
+# (get_track_width swaps left and right when the midpoints are driven with the blue cones on the right, so
+# there they are always the room to the left and right of the direction of travel)
+# all three are contiguous float arrays with one entry per point (inf when there are no cones of that colour)
+Clearance = namedtuple("Clearance", ["left", "right", "width"])
+
+class _Boundary:
+    # the cones of one colour in two KD-trees: a big one over the first indexed cones and a small one
+    # over the cones added since, which is cheap to rebuild on every add
+    def __init__(self):
+        self.points = np.empty((0, 2))
+        self.indexed = 0
+        self.trees = []
+
+    def add(self, points, rebuild_fraction):
+        if not len(points):
+            return
+        # scipy.spatial is slow to import, so it is only loaded once there are cones to index
+        from scipy.spatial import cKDTree
+        self.points = np.concatenate((self.points, points))
+        pending = len(self.points) - self.indexed
+        # the big tree is only rebuilt once the small one holds more than rebuild_fraction of its cones,
+        # until then it is kept and only the small tree over the pending cones is built again
+        trees = self.trees[:1] if self.indexed else []
+        if pending > max(64, rebuild_fraction * self.indexed):
+            self.indexed = len(self.points)
+            trees = [(0, cKDTree(self.points))]
+        if self.indexed < len(self.points):
+            trees.append((self.indexed, cKDTree(self.points[self.indexed:])))
+        self.trees = trees
+
+    def nearest_two(self, points):
+        # distances and indices of the two nearest cones of every point, padded with inf and -1
+        distances = [np.full((len(points), 2), np.inf)]
+        indices = [np.full((len(points), 2), -1, dtype=np.intp)]
+        for offset, tree in self.trees:
+            k = min(2, tree.n)
+            found_distances, found = tree.query(points, k=[1, 2][:k])
+            distances.append(found_distances)
+            indices.append(found + offset)
+        distances = np.concatenate(distances, axis=1)
+        indices = np.concatenate(indices, axis=1)
+        nearest = np.argsort(distances, axis=1, kind="stable")[:, :2]
+        return np.take_along_axis(distances, nearest, axis=1), np.take_along_axis(indices, nearest, axis=1)
+
+    def nearest(self, points):
+        # the nearest cone to every point
+        return self.points[self.nearest_two(points)[1][:, 0]]
+
+    def distances(self, points, max_spacing):
+        # distance from every point to the boundary: the segment between its two nearest cones,
+        # or just the nearest cone when those two are further apart than max_spacing (a gap in the cones)
+        distances, indices = self.nearest_two(points)
+        result = distances[:, 0].copy()
+        if not self.trees:
+            return result
+        a = self.points[np.maximum(indices[:, 0], 0)]
+        ab = self.points[np.maximum(indices[:, 1], 0)] - a
+        length_sq = ab[:, 0] * ab[:, 0] + ab[:, 1] * ab[:, 1]
+        segment = (indices[:, 1] >= 0) & (length_sq > 0) & (length_sq <= max_spacing * max_spacing)
+        ap = points[segment] - a[segment]
+        ab, length_sq = ab[segment], length_sq[segment]
+        t = np.clip((ap[:, 0] * ab[:, 0] + ap[:, 1] * ab[:, 1]) / length_sq, 0.0, 1.0)
+        dx = ap[:, 0] - t * ab[:, 0]
+        dy = ap[:, 1] - t * ab[:, 1]
+        result[segment] = np.sqrt(dx * dx + dy * dy)
+        return result
+
+class ClearanceField:
+    """Distance from points on the track to its left (blue) and right (yellow) boundaries
+
+    The cones of each colour are kept in a KD-tree, and the boundary near a point is taken as
+    the segment between the two cones of that colour nearest to it. Cones can be added as they
+    are detected: they go into a second, small tree that is rebuilt on every add, and the two
+    trees are merged once the small one holds more than rebuild_fraction of the cones in the big one.
+    """
+    def __init__(self, cones=None, colors=None, max_spacing=10.0, rebuild_fraction=0.25):
+        self.max_spacing = max_spacing
+        self.rebuild_fraction = rebuild_fraction
+        self._boundaries = {dlny.YELLOW: _Boundary(), dlny.BLUE: _Boundary()}
+        if cones is not None:
+            self.add_cones(cones, colors)
+
+    def add_cones(self, cones, colors=None):
+        """Adds cones to the field
+
+        Parameters
+        ----------
+        cones: array of (x,y) cone coordinates
+
+        colors: the colour (delauney.YELLOW or delauney.BLUE) of every cone, None means the
+        yellow and blue cones alternate
+        """
+        cones = np.asarray(cones, dtype=float).reshape(-1, 2)
+        colors = dlny.get_alternating_colors(len(cones)) if colors is None else np.asarray(colors)
+        for color, boundary in self._boundaries.items():
+            boundary.add(cones[colors == color], self.rebuild_fraction)
+
+    def query(self, points):
+        """Finds the clearance to both boundaries for many points at once
+
+        Parameters
+        ----------
+        points: (N, 2) array of (x,y) points, e.g the track midpoints
+
+        Returns
+        -------
+        A Clearance (left, right, width) with one entry per point
+        """
+        started = instrumentation.start()
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        left = self._boundaries[dlny.BLUE].distances(points, self.max_spacing)
+        right = self._boundaries[dlny.YELLOW].distances(points, self.max_spacing)
+        instrumentation.stop("track_width", started, points=len(points))
+        return Clearance(left, right, left + right)
+
+    def blue_on_left(self, midpoints):
+        """Whether the blue cones are on the left of the midpoints, driven in the order they are in
+
+        Summed over the midpoints like centerline orders its chains, so a few midpoints near a
+        hairpin or a gap can't flip it. True when there are no cones of one of the colours.
+        """
+        midpoints = np.asarray(midpoints, dtype=float).reshape(-1, 2)
+        yellow, blue = self._boundaries[dlny.YELLOW], self._boundaries[dlny.BLUE]
+        if not yellow.trees or not blue.trees:
+            return True
+        return not _orient_chain(midpoints, yellow.nearest(midpoints), blue.nearest(midpoints))
+
+def get_track_width(midpoints, cones, colors=None, max_spacing=10.0):
+    """Finds the room on either side of every midpoint, see ClearanceField
+
+    Parameters
+    ----------
+    midpoints: array of (x,y) coordinates of the track midpoints
+
+    cones: array of (x,y) cone coordinates
+
+    colors: the colour of every cone, None means the yellow and blue cones alternate
+
+    max_spacing: two cones further apart than this are a gap in the boundary, not a piece of it
+
+    Returns
+    -------
+    A Clearance (left, right, width), with one entry per midpoint like the radius and arc length arrays.
+    left and right are the room to the left and right of the direction the midpoints are driven in,
+    whichever way round the track that is (see ClearanceField.blue_on_left)
+    """
+    field = ClearanceField(cones, colors, max_spacing, rebuild_fraction=0.0)
+    clearance = field.query(midpoints)
+    if field.blue_on_left(midpoints):
+        return clearance
+    return Clearance(clearance.right, clearance.left, clearance.width)